@@ -1,7 +1,7 @@
 """Gmail connector (headers-first).
 
 - OAuth Desktop flow (stores token.json locally)
-- Fetches message metadata: From/To/Cc/Bcc/Date/Subject + snippet + labelIds
+- Fetches message metadata: From/To/Cc/Date/Subject (+ threading ids) + snippet + labelIds
 - Stores into SQLite with FTS5 for fast search
 
 Prereqs:
@@ -18,12 +18,17 @@ Notes:
 import argparse
 import base64
 import json
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 
@@ -34,11 +39,30 @@ SECRET = ROOT / 'client_secret.json'
 TOKEN = ROOT / 'token.json'
 DB = ROOT / 'gmail.sqlite'
 
+# Gmail accepts at most 100 sub-requests per batch HTTP request.
+BATCH_SIZE = 100
+# Parsed batches waiting for the SQLite writer: enough to hide a commit behind the
+# next HTTP batch, small enough that a slow disk doesn't buffer the whole mailbox.
+QUEUE_SIZE = 4
+METADATA_HEADERS = ['Date', 'Subject', 'From', 'To', 'Cc', 'Message-ID', 'References', 'In-Reply-To']
+# header_map keeps only these (lowercased); everything else is dropped before raw_headers_json
+_WANTED = frozenset(h.lower() for h in METADATA_HEADERS)
+
 
 def ensure_db():
     con = sqlite3.connect(str(DB))
     con.execute('PRAGMA journal_mode=WAL;')
     con.execute('PRAGMA synchronous=NORMAL;')
+    con.execute('PRAGMA temp_store=MEMORY;')
+    con.execute('PRAGMA cache_size=-65536;')
+    # older DBs kept a second, content-full copy of the text in emails_fts
+    fts_cols = [r[1] for r in con.execute('PRAGMA table_info(emails_fts)')]
+    if 'id' in fts_cols:
+        con.execute('DROP TABLE emails_fts')
+    has_fts = bool(fts_cols) and 'id' not in fts_cols
+
+    # emails_fts indexes emails by rowid (external content): text is stored once, in emails.
+    # After a VACUUM (which may renumber rowids) run: INSERT INTO emails_fts(emails_fts) VALUES('rebuild')
     con.executescript(
         """
         CREATE TABLE IF NOT EXISTS emails(
@@ -56,15 +80,34 @@ def ensure_db():
         );
 
         CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
-          id,
           subject,
           from_addr,
           to_addr,
           snippet,
-          tokenize='unicode61'
+          content='emails',
+          content_rowid='rowid',
+          tokenize='unicode61 remove_diacritics 2'
         );
+
+        CREATE TRIGGER IF NOT EXISTS emails_ai AFTER INSERT ON emails BEGIN
+          INSERT INTO emails_fts(rowid, subject, from_addr, to_addr, snippet)
+          VALUES (new.rowid, new.subject, new.from_addr, new.to_addr, new.snippet);
+        END;
+        CREATE TRIGGER IF NOT EXISTS emails_ad AFTER DELETE ON emails BEGIN
+          INSERT INTO emails_fts(emails_fts, rowid, subject, from_addr, to_addr, snippet)
+          VALUES ('delete', old.rowid, old.subject, old.from_addr, old.to_addr, old.snippet);
+        END;
+        CREATE TRIGGER IF NOT EXISTS emails_au AFTER UPDATE ON emails BEGIN
+          INSERT INTO emails_fts(emails_fts, rowid, subject, from_addr, to_addr, snippet)
+          VALUES ('delete', old.rowid, old.subject, old.from_addr, old.to_addr, old.snippet);
+          INSERT INTO emails_fts(rowid, subject, from_addr, to_addr, snippet)
+          VALUES (new.rowid, new.subject, new.from_addr, new.to_addr, new.snippet);
+        END;
         """
     )
+    if not has_fts:
+        con.execute("INSERT INTO emails_fts(emails_fts) VALUES('rebuild')")
+        con.commit()
     return con
 
 
@@ -91,13 +134,13 @@ def header_map(headers):
     out = {}
     for h in headers or []:
         name = (h.get('name') or '').lower()
-        if not name:
-            continue
-        out[name] = h.get('value')
+        if name in _WANTED:
+            out[name] = h.get('value')
     return out
 
 
-def upsert_email(con, msg):
+def email_row(msg):
+    """Return the emails row tuple for one Gmail message."""
     mid = msg['id']
     thread_id = msg.get('threadId')
     internal_date = int(msg.get('internalDate') or 0)
@@ -116,19 +159,106 @@ def upsert_email(con, msg):
     label_ids = json.dumps(msg.get('labelIds') or [], ensure_ascii=False)
     raw_headers = json.dumps(hm, ensure_ascii=False)
 
-    con.execute(
+    return (mid, thread_id, internal_date, date, subject, from_addr, to_addr, cc, snippet, label_ids, raw_headers)
+
+
+def write_rows(con, emails):
+    """Upsert a page of messages in one explicit transaction.
+
+    ON CONFLICT DO UPDATE (not INSERT OR REPLACE) so the emails_au trigger
+    fires: REPLACE deletes the old row without running delete triggers.
+    """
+    con.execute('BEGIN')
+    con.executemany(
         """
-        INSERT OR REPLACE INTO emails
+        INSERT INTO emails
         (id, thread_id, internal_date, date, subject, from_addr, to_addr, cc, snippet, label_ids, raw_headers_json)
         VALUES (?,?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(id) DO UPDATE SET
+          thread_id=excluded.thread_id, internal_date=excluded.internal_date, date=excluded.date,
+          subject=excluded.subject, from_addr=excluded.from_addr, to_addr=excluded.to_addr, cc=excluded.cc,
+          snippet=excluded.snippet, label_ids=excluded.label_ids, raw_headers_json=excluded.raw_headers_json
         """,
-        (mid, thread_id, internal_date, date, subject, from_addr, to_addr, cc, snippet, label_ids, raw_headers),
+        emails,
     )
+    con.commit()
 
-    con.execute(
-        "INSERT OR REPLACE INTO emails_fts(id, subject, from_addr, to_addr, snippet) VALUES (?,?,?,?,?)",
-        (mid, subject, from_addr, to_addr, snippet),
-    )
+
+def list_page(svc, query, max_results, page_token):
+    return svc.users().messages().list(userId='me', q=query, maxResults=max_results, pageToken=page_token).execute()
+
+
+def _retryable(exc) -> bool:
+    """Rate limits, server errors and transport failures are worth another try; 4xx are not."""
+    if isinstance(exc, HttpError):
+        return exc.resp.status == 429 or exc.resp.status >= 500
+    return True
+
+
+def fetch_messages(svc, mids, on_msg, retries: int = 3):
+    """Fetch metadata for up to BATCH_SIZE ids in a single batch HTTP request.
+
+    Calls on_msg(msg) for every message received. Ids failing with a
+    retryable error are re-sent in a new batch, with backoff, up to
+    `retries` more times. Returns the [(id, exception)] that still failed.
+    """
+    failed = {}  # id -> latest exception; a retry that succeeds drops it
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            failed[request_id] = exception
+            return
+        failed.pop(request_id, None)
+        on_msg(response)
+
+    for i in range(retries + 1):
+        batch = svc.new_batch_http_request(callback=callback)
+        for mid in mids:
+            batch.add(
+                svc.users().messages().get(userId='me', id=mid, format='metadata', metadataHeaders=METADATA_HEADERS),
+                request_id=mid,
+            )
+        batch.execute()
+        mids = [mid for mid, exc in failed.items() if _retryable(exc)]
+        if not mids or i == retries:
+            break
+        time.sleep(min(2 ** i, 10))
+    return list(failed.items())
+
+
+def produce(svc, list_svc, query, max_results, q, done, errors, failed):
+    """List + batch-fetch messages, putting one list of rows per batch on q.
+
+    Runs on its own thread; sets done when finished (errors collects any exception,
+    failed the (id, exception) of messages that could not be fetched).
+    """
+    listed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            next_page = ex.submit(list_page, list_svc, query, min(500, max_results), None)
+            while next_page is not None:
+                resp = next_page.result()
+                mids = [item['id'] for item in resp.get('messages') or []][: max_results - listed]
+                if not mids:
+                    break
+                listed += len(mids)
+
+                # list the next page while this one's metadata is being fetched
+                page_token = resp.get('nextPageToken')
+                remaining = max_results - listed
+                next_page = None
+                if page_token and remaining > 0:
+                    next_page = ex.submit(list_page, list_svc, query, min(500, remaining), page_token)
+
+                for i in range(0, len(mids), BATCH_SIZE):
+                    buf = []
+                    failed.extend(fetch_messages(svc, mids[i:i + BATCH_SIZE], lambda msg: buf.append(email_row(msg))))
+                    if buf:
+                        q.put(buf)
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        done.set()
 
 
 def main():
@@ -139,37 +269,44 @@ def main():
 
     con = ensure_db()
     svc = get_service()
+    # httplib2 is not thread-safe: the prefetch thread gets its own service/connection
+    list_svc = get_service()
+
+    q = queue.Queue(maxsize=QUEUE_SIZE)
+    done = threading.Event()
+    errors = []
+    failed = []
+    producer = threading.Thread(
+        target=produce, args=(svc, list_svc, args.query, args.max, q, done, errors, failed), daemon=True
+    )
+    producer.start()
 
+    # this thread is the only SQLite writer: drain whatever batches are ready into one transaction
     n = 0
-    page_token = None
-
-    while True:
-        resp = svc.users().messages().list(userId='me', q=args.query, maxResults=min(500, args.max - n), pageToken=page_token).execute()
-        mids = resp.get('messages') or []
-        if not mids:
-            break
-
-        for item in mids:
-            mid = item['id']
-            msg = svc.users().messages().get(userId='me', id=mid, format='metadata', metadataHeaders=['From','To','Cc','Date','Subject']).execute()
-            upsert_email(con, msg)
-            n += 1
-            if n % 50 == 0:
-                con.commit()
-                print(f"... {n}")
-            if n >= args.max:
+    while not (done.is_set() and q.empty()):
+        try:
+            email_batch = q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        while True:
+            try:
+                email_batch.extend(q.get_nowait())
+            except queue.Empty:
                 break
-
-        con.commit()
-        if n >= args.max:
-            break
-
-        page_token = resp.get('nextPageToken')
-        if not page_token:
-            break
-
-    con.commit()
-    print(json.dumps({'indexed': n, 'db': str(DB)}, ensure_ascii=False))
+        write_rows(con, email_batch)
+        n += len(email_batch)
+        print(f"... {n}")
+
+    producer.join()
+    if errors:
+        raise errors[0]
+
+    for mid, exc in failed:
+        print(f"WARN get failed id={mid}: {type(exc).__name__}: {exc}")
+    print(json.dumps({'indexed': n, 'failed': len(failed), 'db': str(DB)}, ensure_ascii=False))
+    if failed:
+        # the index is missing these messages: don't let the sync look complete
+        raise SystemExit(f"{len(failed)} message(s) could not be fetched; re-run to retry them")
 
 
 if __name__ == '__main__':
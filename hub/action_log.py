@@ -3,7 +3,8 @@
 World-class goal:
 - One durable, queryable source of truth for *everything the agent runs*.
 - Structured fields + raw JSON params/extra.
-- Safe for long-running jobs, crash-tolerant.
+- Safe for long-running jobs; a crash loses at most the last ~200ms of events
+  (failures are committed immediately).
 
 DB: hub/actions.sqlite
 
@@ -13,13 +14,20 @@ Usage:
       ...
       ev.ok(extra={'embedded': 5000})
 
-Schema is auto-migrated (adds columns when needed).
+Schema is auto-migrated (adds columns when needed) once per process; the
+connection is shared and commits are coalesced by a background thread
+(every ~200ms, plus a final flush at exit). A hard kill inside that window
+loses the uncommitted events; ev.fail() and the exception path of log_event
+commit synchronously, so error records survive it.
 """
 
 from __future__ import annotations
 
+import atexit
+import functools
 import json
 import sqlite3
+import threading
 import time
 import traceback
 from contextlib import contextmanager
@@ -27,23 +35,57 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import orjson
+
+    def _dumps(o) -> str:
+        return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    _loads = orjson.loads
+except ImportError:  # stdlib fallback, same output modulo whitespace
+    def _dumps(o) -> str:
+        return json.dumps(o, ensure_ascii=False)
+
+    _loads = json.loads
+
+
 DEFAULT_DB = Path(__file__).resolve().parent / 'actions.sqlite'
 
+# maintenance on open: truncate an oversized WAL, re-ANALYZE every N new events
+_WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+_ANALYZE_EVERY = 10_000
+
+# all writes on the shared connections go through this lock
+_WRITE_LOCK = threading.RLock()
+_COMMIT_INTERVAL = 0.2
+_dirty: set[sqlite3.Connection] = set()
+_dirty_event = threading.Event()
+_committer: threading.Thread | None = None
+
 
 def _utcnow_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
 def _has_column(con: sqlite3.Connection, table: str, col: str) -> bool:
-    rows = con.execute(f"PRAGMA table_info({table})").fetchall()
+    # table_xinfo also lists generated (hidden) columns
+    rows = con.execute(f"PRAGMA table_xinfo({table})").fetchall()
     return any(r[1] == col for r in rows)
 
 
 def ensure_db(db_path: Path = DEFAULT_DB) -> sqlite3.Connection:
+    """Return the process-wide connection for db_path (opened and migrated once)."""
+    return _open_db(str(db_path))
+
+
+@functools.lru_cache(maxsize=8)
+def _open_db(path: str) -> sqlite3.Connection:
+    db_path = Path(path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(str(db_path))
+    con = sqlite3.connect(str(db_path), check_same_thread=False)
     con.execute('PRAGMA journal_mode=WAL;')
     con.execute('PRAGMA synchronous=NORMAL;')
+    con.execute('PRAGMA wal_autocheckpoint=2000;')
 
     # base schema
     con.executescript(
@@ -62,9 +104,11 @@ def ensure_db(db_path: Path = DEFAULT_DB) -> sqlite3.Connection:
           extra_json TEXT,
           error TEXT
         );
-        CREATE INDEX IF NOT EXISTS idx_events_kind ON events(kind);
-        CREATE INDEX IF NOT EXISTS idx_events_status ON events(status);
         CREATE INDEX IF NOT EXISTS idx_events_ts_start ON events(ts_start);
+        CREATE TABLE IF NOT EXISTS meta(
+          key TEXT PRIMARY KEY,
+          value TEXT
+        );
         """
     )
 
@@ -75,11 +119,121 @@ def ensure_db(db_path: Path = DEFAULT_DB) -> sqlite3.Connection:
         con.execute('ALTER TABLE events ADD COLUMN tags TEXT')
     if not _has_column(con, 'events', 'log_path'):
         con.execute('ALTER TABLE events ADD COLUMN log_path TEXT')
+    if not _has_column(con, 'events', 'search_blob'):
+        # one column for the short-term LIKE fallback instead of five ORed LIKEs. VIRTUAL: computed
+        # on read, so no trigger rewriting each row (and re-firing the FTS/version triggers).
+        # char(31) between fields keeps a match from spanning two columns.
+        con.execute(
+            """
+            ALTER TABLE events ADD COLUMN search_blob TEXT GENERATED ALWAYS AS (
+              COALESCE(kind, '') || char(31) || COALESCE(message, '') || char(31) || COALESCE(params_json, '')
+              || char(31) || COALESCE(extra_json, '') || char(31) || COALESCE(error, '')
+            ) VIRTUAL
+            """
+        )
+
+    # substring search: trigram FTS5 over the text columns (external content, kept in sync by triggers)
+    has_fts = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='events_fts'").fetchone() is not None
+    con.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_events_kind_status_ts ON events(kind, status, ts_start DESC);
+        -- ledger API: WHERE kind=? / status=? ORDER BY id DESC LIMIT n, no sort step
+        -- (these also serve plain kind=? / status=? lookups, so the single-column ones go)
+        CREATE INDEX IF NOT EXISTS idx_events_kind_id ON events(kind, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_events_status_id ON events(status, id DESC);
+        DROP INDEX IF EXISTS idx_events_kind;
+        DROP INDEX IF EXISTS idx_events_status;
+        CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+          kind, message, params_json, extra_json, error,
+          content='events', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS events_ai AFTER INSERT ON events BEGIN
+          INSERT INTO events_fts(rowid, kind, message, params_json, extra_json, error)
+          VALUES (new.id, new.kind, new.message, new.params_json, new.extra_json, new.error);
+        END;
+        CREATE TRIGGER IF NOT EXISTS events_ad AFTER DELETE ON events BEGIN
+          INSERT INTO events_fts(events_fts, rowid, kind, message, params_json, extra_json, error)
+          VALUES ('delete', old.id, old.kind, old.message, old.params_json, old.extra_json, old.error);
+        END;
+        CREATE TRIGGER IF NOT EXISTS events_au AFTER UPDATE ON events BEGIN
+          INSERT INTO events_fts(events_fts, rowid, kind, message, params_json, extra_json, error)
+          VALUES ('delete', old.id, old.kind, old.message, old.params_json, old.extra_json, old.error);
+          INSERT INTO events_fts(rowid, kind, message, params_json, extra_json, error)
+          VALUES (new.id, new.kind, new.message, new.params_json, new.extra_json, new.error);
+        END;
+
+        -- bumped on every change to events: readers (ledger ETags) compare it instead of re-querying
+        INSERT OR IGNORE INTO meta(key, value) VALUES ('events_version', 0);
+        CREATE TRIGGER IF NOT EXISTS events_version_ai AFTER INSERT ON events BEGIN
+          UPDATE meta SET value = value + 1 WHERE key = 'events_version';
+        END;
+        CREATE TRIGGER IF NOT EXISTS events_version_au AFTER UPDATE ON events BEGIN
+          UPDATE meta SET value = value + 1 WHERE key = 'events_version';
+        END;
+        CREATE TRIGGER IF NOT EXISTS events_version_ad AFTER DELETE ON events BEGIN
+          UPDATE meta SET value = value + 1 WHERE key = 'events_version';
+        END;
+        """
+    )
+    if not has_fts:
+        # index rows written before the FTS table existed
+        con.execute("INSERT INTO events_fts(events_fts) VALUES('rebuild')")
 
+    _maybe_analyze(con)
     con.commit()
+
+    wal = Path(path + '-wal')
+    if wal.exists() and wal.stat().st_size > _WAL_TRUNCATE_BYTES:
+        con.execute('PRAGMA wal_checkpoint(TRUNCATE);')
     return con
 
 
+def _maybe_analyze(con: sqlite3.Connection):
+    """ANALYZE once the ledger has grown past another _ANALYZE_EVERY events.
+
+    MAX(id) stands in for COUNT(*): ids are AUTOINCREMENT and events are never
+    deleted in bulk, and it's an O(1) lookup instead of a table scan.
+    """
+    rows = con.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+    last = con.execute("SELECT value FROM meta WHERE key='analyze_rows'").fetchone()
+    last_rows = int(last[0]) if last else 0
+    if rows // _ANALYZE_EVERY <= last_rows // _ANALYZE_EVERY:
+        return
+    con.execute('ANALYZE')
+    con.executemany(
+        "INSERT INTO meta(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        [('analyze_rows', str(rows)), ('last_analyze', _utcnow_iso())],
+    )
+
+
+def flush():
+    """Commit pending ledger writes now (also runs at interpreter exit)."""
+    with _WRITE_LOCK:
+        while _dirty:
+            _dirty.pop().commit()
+
+
+def _commit_loop():
+    while True:
+        _dirty_event.wait()
+        time.sleep(_COMMIT_INTERVAL)  # let bursts of events share one commit
+        _dirty_event.clear()
+        flush()
+
+
+def _schedule_commit(con: sqlite3.Connection):
+    global _committer
+    with _WRITE_LOCK:
+        _dirty.add(con)
+        if _committer is None:
+            _committer = threading.Thread(target=_commit_loop, name='action_log-commit', daemon=True)
+            _committer.start()
+    _dirty_event.set()
+
+
+atexit.register(flush)
+
+
 @dataclass
 class _EventHandle:
     con: sqlite3.Connection
@@ -94,24 +248,51 @@ class _EventHandle:
         self._finish('warn', extra=extra, error=error)
 
     def fail(self, error: str, extra: dict | None = None):
-        self._finish('error', extra=extra, error=error)
+        # terminal error: commit now, the process may be about to die
+        self._finish('error', extra=extra, error=error, sync=True)
 
-    def _finish(self, status: str, extra: dict | None = None, error: str | None = None):
+    def _finish(self, status: str, extra: dict | None = None, error: str | None = None, sync: bool = False):
         t1 = time.time()
         ts_end = _utcnow_iso()
         seconds = t1 - self.t0
-        self.con.execute(
-            "UPDATE events SET ts_end=?, status=?, seconds=?, extra_json=?, error=? WHERE id=?",
-            (
-                ts_end,
-                status,
-                float(seconds),
-                json.dumps(extra or {}, ensure_ascii=False),
-                error,
-                self.row_id,
-            ),
-        )
-        self.con.commit()
+        with _WRITE_LOCK:
+            self.con.execute(
+                "UPDATE events SET ts_end=?, status=?, seconds=?, extra_json=?, error=? WHERE id=?",
+                (
+                    ts_end,
+                    status,
+                    float(seconds),
+                    _dumps(extra or {}),
+                    error,
+                    self.row_id,
+                ),
+            )
+            if sync:
+                _dirty.discard(self.con)
+                self.con.commit()
+        if not sync:
+            _schedule_commit(self.con)
+
+
+_TAG_RULES = Path(__file__).resolve().parent / 'project_tags.json'
+
+
+@functools.lru_cache(maxsize=1)
+def _read_tag_rules(mtime_ns: int) -> tuple:
+    rules = _loads(_TAG_RULES.read_bytes())
+    return tuple(
+        (proj.get('tag'), tuple(pat.lower() for pat in proj.get('patterns', []) if pat))
+        for proj in rules.get('projects', [])
+    )
+
+
+def _tag_rules() -> tuple:
+    """project_tags.json as ((tag, (lowercased patterns...)), ...), re-parsed only when it changes."""
+    try:
+        mtime_ns = _TAG_RULES.stat().st_mtime_ns
+    except OSError:
+        return ()
+    return _read_tag_rules(mtime_ns)
 
 
 @contextmanager
@@ -130,36 +311,33 @@ def log_event(
     # auto-tags via simple pattern rules
     final_tags = list(tags or [])
     try:
-        rules_path = Path(__file__).resolve().parent / 'project_tags.json'
-        if rules_path.exists():
-            rules = json.loads(rules_path.read_text(encoding='utf-8'))
-            hay = (message or '') + ' ' + json.dumps(params or {}, ensure_ascii=False)
+        rules = _tag_rules()
+        if rules:
+            hay = (message or '') + ' ' + _dumps(params or {})
             low = hay.lower()
-            for proj in rules.get('projects', []):
-                tag = proj.get('tag')
-                for pat in proj.get('patterns', []):
-                    if pat and pat.lower() in low:
-                        if tag and tag not in final_tags:
-                            final_tags.append(tag)
-                        break
+            for tag, pats in rules:
+                if tag and tag not in final_tags and any(pat in low for pat in pats):
+                    final_tags.append(tag)
     except Exception:
         pass
 
-    cur = con.execute(
-        "INSERT INTO events(ts_start, kind, status, message, tags, log_path, params_json, extra_json) VALUES (?,?,?,?,?,?,?,?)",
-        (
-            ts_start,
-            kind,
-            'running',
-            message,
-            json.dumps(final_tags, ensure_ascii=False),
-            log_path,
-            json.dumps(params or {}, ensure_ascii=False),
-            json.dumps({}, ensure_ascii=False),
-        ),
-    )
-    con.commit()
-    ev = _EventHandle(con=con, row_id=int(cur.lastrowid), kind=kind, t0=t0)
+    with _WRITE_LOCK:
+        cur = con.execute(
+            "INSERT INTO events(ts_start, kind, status, message, tags, log_path, params_json, extra_json) VALUES (?,?,?,?,?,?,?,?)",
+            (
+                ts_start,
+                kind,
+                'running',
+                message,
+                _dumps(final_tags),
+                log_path,
+                _dumps(params or {}),
+                '{}',
+            ),
+        )
+        row_id = int(cur.lastrowid)
+    _schedule_commit(con)
+    ev = _EventHandle(con=con, row_id=row_id, kind=kind, t0=t0)
 
     try:
         yield ev
@@ -10,6 +10,12 @@ import sqlite3
 from pathlib import Path
 
 
+def _row_md(row) -> str:
+    rid, ts_start, ts_end, kind, status, seconds, message = row
+    msg = (message or '').replace('\n', ' ')[:120]
+    return f"\n| {rid} | {ts_start} | {status} | {kind} | {seconds or 0:.2f} | {msg} |"
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--db', default=str(Path(__file__).resolve().parent / 'actions.sqlite'))
@@ -25,29 +31,31 @@ def main():
         pass
 
     con = sqlite3.connect(args.db)
-    rows = con.execute(
+    con.execute('PRAGMA mmap_size=268435456')
+    # rowid-ordered scan (no sort step); count first so rows can be streamed straight to the file
+    count = con.execute("SELECT COUNT(*) FROM (SELECT id FROM events ORDER BY id DESC LIMIT ?)", (args.limit,)).fetchone()[0]
+    cur = con.execute(
         "SELECT id, ts_start, ts_end, kind, status, seconds, message FROM events ORDER BY id DESC LIMIT ?",
         (args.limit,),
-    ).fetchall()
+    )
 
-    lines = [
+    header = [
         '# Actions report',
         '',
         f"DB: `{args.db}`",
-        f"Count: {len(rows)}",
+        f"Count: {count}",
         '',
         '| id | ts_start | status | kind | seconds | message |',
         '|---:|---|---|---|---:|---|',
     ]
 
-    for rid, ts_start, ts_end, kind, status, seconds, message in rows:
-        msg = (message or '').replace('\n', ' ')[:120]
-        lines.append(f"| {rid} | {ts_start} | {status} | {kind} | {seconds or 0:.2f} | {msg} |")
-
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text('\n'.join(lines), encoding='utf-8')
-    print(json.dumps({'out': str(out), 'rows': len(rows)}, ensure_ascii=False))
+    with out.open('w', encoding='utf-8') as fh:
+        fh.write('\n'.join(header))
+        for batch in iter(lambda: cur.fetchmany(256), []):
+            fh.writelines(map(_row_md, batch))
+    print(json.dumps({'out': str(out), 'rows': count}, ensure_ascii=False))
 
 
 if __name__ == '__main__':
@@ -4,6 +4,11 @@ import sqlite3
 from datetime import datetime
 from pathlib import Path
 
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
 
 def main():
     ap = argparse.ArgumentParser()
@@ -26,7 +31,11 @@ def main():
 
     con = sqlite3.connect(args.db)
 
-    q = "SELECT id, ts_start, ts_end, kind, status, seconds, message, tags, log_path, params_json, extra_json, error FROM events"
+    if args.format == 'compact':
+        # the human listing only prints these; skip the JSON/text columns entirely
+        q = "SELECT id, ts_start, kind, status, seconds, message FROM events"
+    else:
+        q = "SELECT id, ts_start, ts_end, kind, status, seconds, message, tags, log_path, params_json, extra_json, error FROM events"
     where = []
     params = []
 
@@ -42,10 +51,14 @@ def main():
     if args.until:
         where.append('ts_start<=?')
         params.append(args.until)
-    if args.q:
-        where.append('(kind LIKE ? OR message LIKE ? OR params_json LIKE ? OR extra_json LIKE ? OR error LIKE ?)')
-        like = f"%{args.q}%"
-        params.extend([like, like, like, like, like])
+    if args.q and len(args.q) >= 3:
+        # trigram FTS: indexed substring match (quoted as one phrase)
+        where.append('id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)')
+        params.append('"%s"' % args.q.replace('"', '""'))
+    elif args.q:
+        # trigrams need >= 3 chars; shorter terms fall back to a LIKE scan
+        where.append('search_blob LIKE ?')
+        params.append(f"%{args.q}%")
 
     if where:
         q += ' WHERE ' + ' AND '.join(where)
@@ -55,6 +68,15 @@ def main():
 
     rows = con.execute(q, params).fetchall()
 
+    if args.format == 'compact':
+        # compact (human)
+        for id_, ts_start, kind, status, seconds, message in rows:
+            msg = (message or '').strip()
+            if msg:
+                msg = ' — ' + msg
+            print(f"#{id_} {ts_start} [{status}] {kind} {seconds:.2f}s{msg}")
+        return
+
     out = []
     for r in rows:
         out.append({
@@ -65,23 +87,14 @@ def main():
             'status': r[4],
             'seconds': r[5],
             'message': r[6],
-            'tags': json.loads(r[7] or '[]'),
+            'tags': _loads(r[7] or '[]'),
             'log_path': r[8],
-            'params': json.loads(r[9] or '{}'),
-            'extra': json.loads(r[10] or '{}'),
+            'params': _loads(r[9] or '{}'),
+            'extra': _loads(r[10] or '{}'),
             'error': r[11],
         })
 
-    if args.format == 'json':
-        print(json.dumps(out, ensure_ascii=False, indent=2))
-        return
-
-    # compact (human)
-    for e in out:
-        msg = (e['message'] or '').strip()
-        if msg:
-            msg = ' — ' + msg
-        print(f"#{e['id']} {e['ts_start']} [{e['status']}] {e['kind']} {e['seconds']:.2f}s{msg}")
+    print(json.dumps(out, ensure_ascii=False, indent=2))
 
 
 if __name__ == '__main__':
@@ -10,39 +10,100 @@ Usage:
 """
 
 import argparse
+import heapq
 import json
 import math
+import os
 import re
 import sqlite3
 import struct
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
 from action_log import log_event
 
+try:
+    import orjson
+
+    def _dumps(o) -> str:
+        return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    _loads = orjson.loads
+except ImportError:  # stdlib fallback, same output modulo whitespace
+    def _dumps(o) -> str:
+        return json.dumps(o, ensure_ascii=False)
+
+    _loads = json.loads
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback (list-based unpack_f32 + cosine)
+    np = None
+
+try:
+    from numba import njit
+except ImportError:  # NumPy blockwise path in SemIndex._scores
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _score_i8(M, Qt, w, out):
+        # fused dequantize + dot + scale/norm: one pass over the int8 rows, no temporaries
+        n, d = M.shape
+        for i in range(n):
+            for j in range(Qt.shape[0]):
+                acc = np.float32(0.0)
+                for k in range(d):
+                    acc += np.float32(M[i, k]) * Qt[j, k]
+                out[i, j] = acc * w[i]
+
 # Ollama embeddings
 BASE = 'http://127.0.0.1:11434'
 EMBED_MODEL = 'nomic-embed-text:latest'
 
 
 def ollama_embed(text: str):
-    payload = json.dumps({'model': EMBED_MODEL, 'prompt': text}).encode('utf-8')
+    payload = _dumps({'model': EMBED_MODEL, 'prompt': text}).encode('utf-8')
     req = urllib.request.Request(BASE + '/api/embeddings', data=payload, headers={'Content-Type': 'application/json'})
     with urllib.request.urlopen(req, timeout=600) as r:
-        out = json.loads(r.read().decode('utf-8'))
+        out = _loads(r.read())
     v = out.get('embedding')
     if not v:
         raise RuntimeError('empty embedding')
     return [float(x) for x in v]
 
 
+def embed_all(terms: list[str], max_workers: int = 8) -> list:
+    """Embed terms concurrently (one Ollama request each, overlapped).
+
+    Returns vectors in input order; a failed term yields its exception.
+    """
+    def one(term):
+        try:
+            return ollama_embed(term)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(terms)))) as ex:
+        return list(ex.map(one, terms))
+
+
 def unpack_f32(blob: bytes):
+    if np is not None:
+        return np.frombuffer(blob, dtype='<f4')  # zero-copy view
     n = len(blob) // 4
     return list(struct.unpack('<' + 'f' * n, blob))
 
 
 def cosine(a, b):
+    if np is not None:
+        a = np.asarray(a, dtype='<f4')
+        b = np.asarray(b, dtype='<f4')
+        na = float(np.linalg.norm(a))
+        nb = float(np.linalg.norm(b))
+        return 0.0 if na == 0.0 or nb == 0.0 else float(a @ b) / (na * nb)
     dot = 0.0
     na = 0.0
     nb = 0.0
@@ -55,46 +116,200 @@ def cosine(a, b):
     return dot / (math.sqrt(na) * math.sqrt(nb))
 
 
+# any run of non [a-z0-9] chars (hyphens included) becomes one '-': same result as
+# replacing [^a-z0-9-]+ and then collapsing -+, in a single pass
+_SLUG_SEP = re.compile(r"[^a-z0-9]+")
+
+
 def sanitize_slug(s: str) -> str:
-    s = s.strip().lower()
-    s = re.sub(r"[^a-z0-9\-]+", "-", s)
-    s = re.sub(r"-+", "-", s).strip('-')
-    return s or 'canon'
+    return _SLUG_SEP.sub('-', s.strip().lower()).strip('-') or 'canon'
 
 
-def fts_query(chat_db: Path, term: str, limit: int):
-    con = sqlite3.connect(str(chat_db))
+def fts_query(con: sqlite3.Connection, term: str, limit: int):
+    # ORDER BY rank (bm25) is resolved by the FTS5 MATCH iterator itself, so LIMIT
+    # applies without collecting and sorting every hit on a non-FTS column
     q = """
       SELECT message_id, conversation_id, author_role, created_at,
              snippet(messages_fts, 4, '[', ']', '…', 18) as snip
       FROM messages_fts
       WHERE messages_fts MATCH ?
-      ORDER BY created_at DESC
+      ORDER BY rank
       LIMIT ?
     """
     match = '"%s"' % term.replace('"', '') if ' ' in term else term
     return con.execute(q, (match, limit)).fetchall()
 
 
-def semantic_query(sem_db: Path, query: str, limit: int, min_len: int = 120):
-    con = sqlite3.connect(str(sem_db))
-    qv = ollama_embed(query)
-    rows = con.execute('SELECT v.id, v.v, d.meta_json, d.text FROM vecs v JOIN docs d ON d.id=v.id').fetchall()
+def _top_k(scores, k: int):
+    """Indices of the k best scores, best first (argpartition, no full sort)."""
+    k = min(k, scores.size)
+    if k <= 0:
+        return []
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
 
-    scored = []
-    for mid, blob, meta_json, text in rows:
-        if not text or len(text) < min_len:
-            continue
-        v = unpack_f32(blob)
-        s = cosine(qv, v)
-        scored.append((s, mid, meta_json, text))
+def _mtime_ns(db: Path) -> int:
+    # WAL-mode writers may only touch the -wal file until the next checkpoint
+    wal = db.with_name(db.name + '-wal')
+    return max(p.stat().st_mtime_ns for p in (db, wal) if p.exists())
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    out = []
-    for s, mid, meta_json, text in scored[:limit]:
-        meta = json.loads(meta_json) if meta_json else {}
-        out.append((float(s), mid, meta, text))
-    return out
+
+# rows upcast to float32 per matmul when scanning the int8 sidecar
+_SCAN_ROWS = 16384
+# rows per fetchmany when building the sidecar from semantic.sqlite
+_FETCH_ROWS = 4096
+
+
+class SemIndex:
+    """semantic.sqlite vectors, loaded once and queried for every term.
+
+    With NumPy the vectors are persisted next to the DB as an int8 matrix
+    <db>.npy (one scale per row, 4x fewer bytes than float32) plus
+    <db>.side.npz for ids, text lengths, scales, row norms and the DB mtime
+    the sidecar was built from. It is only rebuilt when the DB has changed
+    since; later runs just mmap it.
+    """
+
+    def __init__(self, sem_db: Path):
+        self.con = sqlite3.connect(str(sem_db))
+        if np is None:
+            self.rows = self.con.execute('SELECT v.id, v.v, d.meta_json, d.text FROM vecs v JOIN docs d ON d.id=v.id').fetchall()
+            return
+
+        npy = sem_db.with_name(sem_db.name + '.npy')
+        side_npz = sem_db.with_name(sem_db.name + '.side.npz')
+        # taken before the build: a write during it leaves the sidecar stale for the next run
+        src_mtime = _mtime_ns(sem_db)
+        if not self._load(npy, side_npz, src_mtime):
+            self._build(npy, side_npz, src_mtime)
+            self._load(npy, side_npz, src_mtime)
+
+    def _load(self, npy: Path, side_npz: Path, src_mtime: int) -> bool:
+        if not (npy.exists() and side_npz.exists()):
+            return False
+        try:
+            with np.load(str(side_npz), allow_pickle=False) as side:
+                if int(side['src_mtime']) != src_mtime:
+                    return False
+                ids, lens, scales, norms = side['ids'], side['lens'], side['scales'], side['norms']
+            M = np.load(str(npy), mmap_mode='r', allow_pickle=False)
+        except (OSError, KeyError, ValueError):
+            return False  # partial or older-format sidecar
+        if M.dtype != np.int8 or len(M) != len(ids):
+            return False
+        self.M = M
+        self.ids = ids.tolist()
+        self.lens = lens
+        self.scales = scales
+        self.norms = norms
+        return True
+
+    def _build(self, npy: Path, side_npz: Path, src_mtime: int):
+        cur = self.con.execute('SELECT v.id, v.v, length(d.text) FROM vecs v JOIN docs d ON d.id=v.id')
+        cur.arraysize = _FETCH_ROWS
+        # quantize chunk by chunk: the float32 matrix is never materialized whole
+        ids, lens, Qs, all_scales, all_norms = [], [], [], [], []
+        while True:
+            rows = cur.fetchmany()
+            if not rows:
+                break
+            M = np.stack([np.frombuffer(blob, dtype='<f4') for _, blob, _ in rows])
+            norms = np.linalg.norm(M, axis=1)
+            norms[norms == 0.0] = np.inf  # zero vectors score 0, like cosine()
+            # symmetric int8: v ~= q * scale with scale = max|v| / 127 per row
+            scales = np.abs(M).max(axis=1, initial=0.0) / 127.0
+            scales[scales == 0.0] = 1.0
+            Qs.append(np.rint(M / scales[:, None]).astype(np.int8))
+            all_scales.append(scales.astype(np.float32))
+            all_norms.append(norms)
+            ids.extend(str(r[0]) for r in rows)
+            lens.extend(r[2] or 0 for r in rows)
+        Q = np.concatenate(Qs) if Qs else np.zeros((0, 0), dtype=np.int8)
+        # write to temp files then swap, so a concurrent run never mmaps a partial matrix
+        with open(str(npy) + '.tmp', 'wb') as f:
+            np.save(f, Q, allow_pickle=False)
+        with open(str(side_npz) + '.tmp', 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array(ids, dtype=str),
+                lens=np.array(lens, dtype=np.int64),
+                scales=np.concatenate(all_scales) if all_scales else np.zeros(0, dtype=np.float32),
+                norms=np.concatenate(all_norms) if all_norms else np.zeros(0),
+                src_mtime=np.int64(src_mtime),
+            )
+        os.replace(str(side_npz) + '.tmp', side_npz)
+        os.replace(str(npy) + '.tmp', npy)
+
+    def _scores(self, Q):
+        w = (self.scales / self.norms).astype(np.float32)
+        out = np.empty((len(self.ids), Q.shape[1]), dtype=np.float32)
+        if njit is not None:
+            _score_i8(np.asarray(self.M), np.ascontiguousarray(Q.T), w, out)
+            return out
+        # NumPy has no BLAS kernel for int8, so dequantize a block at a time
+        # and let SGEMM do the dot products; the full matrix is never upcast
+        for i in range(0, len(out), _SCAN_ROWS):
+            out[i:i + _SCAN_ROWS] = self.M[i:i + _SCAN_ROWS].astype(np.float32) @ Q
+        return out * w[:, None]
+
+    def query(self, term: str, limit: int, min_len: int = 120):
+        hits = self.query_many([term], limit, min_len)[term]
+        if isinstance(hits, Exception):
+            raise hits
+        return hits
+
+    def query_many(self, terms: list[str], limit: int, min_len: int = 120) -> dict:
+        """Hits for every term, embedded concurrently and scored in one pass.
+
+        Returns {term: [(score, id, meta, text), ...]}; a term whose
+        embedding failed maps to the exception instead.
+        """
+        qvs = dict(zip(terms, embed_all(terms)))
+        out = {t: qv for t, qv in qvs.items() if isinstance(qv, Exception)}
+        terms = [t for t in qvs if t not in out]
+
+        if np is None:
+            for t in terms:
+                scored = []
+                for mid, blob, meta_json, text in self.rows:
+                    if not text or len(text) < min_len:
+                        continue
+                    v = unpack_f32(blob)
+                    s = cosine(qvs[t], v)
+                    scored.append((s, mid, meta_json, text))
+                best = heapq.nlargest(limit, scored, key=lambda x: x[0])
+                out[t] = [(float(s), mid, _loads(meta_json) if meta_json else {}, text) for s, mid, meta_json, text in best]
+            return out
+
+        Q = np.asarray([qvs[t] for t in terms], dtype=np.float32).reshape(len(terms), -1).T
+        qn = np.linalg.norm(Q, axis=0)
+        qn[qn == 0.0] = np.inf  # zero query -> no hits
+        if not self.ids or not terms:
+            return {**out, **{t: [] for t in terms}}
+
+        # one (n, len(terms)) score matrix: a single pass over the vectors
+        mask = self.lens >= min_len
+        scores = self._scores(Q / qn)
+        scores[~mask] = -np.inf
+        tops = {t: [i for i in _top_k(scores[:, j], limit) if mask[i] and np.isfinite(qn[j])] for j, t in enumerate(terms)}
+
+        # only the hits need their text/meta
+        hit_ids = sorted({self.ids[i] for top in tops.values() for i in top})
+        docs = {}
+        if hit_ids:
+            docs = {
+                mid: (meta_json, text)
+                for mid, meta_json, text in self.con.execute(
+                    f"SELECT id, meta_json, text FROM docs WHERE id IN ({','.join('?' * len(hit_ids))})", hit_ids
+                )
+            }
+        for j, t in enumerate(terms):
+            out[t] = []
+            for i in tops[t]:
+                meta_json, text = docs.get(self.ids[i], (None, None))
+                out[t].append((float(scores[i, j]), self.ids[i], _loads(meta_json) if meta_json else {}, text))
+        return out
 
 
 def main():
@@ -131,10 +346,11 @@ def main():
 
         # 1) FTS results per term
         fts_md = [f"# FTS hits — {slug}", f"Generated: {generated}", ""]
+        chat = sqlite3.connect(str(chat_db))
         for term in args.terms:
             fts_md.append(f"## {term}")
             try:
-                rows = fts_query(chat_db, term, args.fts_limit)
+                rows = fts_query(chat, term, args.fts_limit)
             except Exception as e:
                 fts_md.append(f"(error: {e})\n")
                 continue
@@ -149,12 +365,15 @@ def main():
 
         # 2) Semantic results per query
         sem_md = [f"# Semantic recall — {slug}", f"Generated: {generated}", ""]
+        try:
+            sem_hits = SemIndex(sem_db).query_many(args.terms, args.sem_limit)
+        except Exception as e:
+            sem_hits = {term: e for term in args.terms}
         for term in args.terms:
             sem_md.append(f"## {term}")
-            try:
-                hits = semantic_query(sem_db, term, args.sem_limit)
-            except Exception as e:
-                sem_md.append(f"(error: {e})\n")
+            hits = sem_hits[term]
+            if isinstance(hits, Exception):
+                sem_md.append(f"(error: {hits})\n")
                 continue
             for score, mid, meta, text in hits:
                 cid = meta.get('conversation_id')
@@ -17,31 +17,105 @@ Later we can merge ports.
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
+import os
+import sqlite3
+import sys
+import threading
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
 ROOT = Path(__file__).resolve().parent
+# `hub.search` needs the repo root importable, and hub/ itself for its flat `action_log` import
+for _p in (str(ROOT.parent), str(ROOT)):
+    if _p not in sys.path:
+        sys.path.append(_p)
+
+from hub import search as s  # noqa: E402
+
 REGISTRY = ROOT.parent / 'registry' / 'projects.json'
 CANON_DIR = ROOT / '_canon'
 
 app = FastAPI(title='matter-hub')
 
+JINJA_CACHE = ROOT / '.jinja_cache'
+JINJA_CACHE.mkdir(exist_ok=True)
+
+# compiled templates land on disk (first hit after a restart skips the compile);
+# templates are all loaded at import below, so no per-request mtime checks
 env = Environment(
     loader=FileSystemLoader(str(ROOT / 'templates')),
     autoescape=select_autoescape(['html', 'xml']),
+    bytecode_cache=FileSystemBytecodeCache(directory=str(JINJA_CACHE)),
+    auto_reload=False,
 )
 
 app.mount('/static', StaticFiles(directory=str(ROOT), html=False), name='static')
 
 
+@functools.lru_cache(maxsize=4)
+def _parse_json(path: Path, mtime_ns: int):
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+@functools.lru_cache(maxsize=64)
+def _scan_dir(path: Path, mtime_ns: int, dirs: bool) -> tuple[str, ...]:
+    return tuple(sorted(p.name for p in path.iterdir() if (p.is_dir() if dirs else p.is_file())))
+
+
+# keyed on mtime: an edited file/dir gets re-read, an unchanged one never is
+def _cached_json(path: Path):
+    if not path.exists():
+        return None
+    return _parse_json(path, path.stat().st_mtime_ns)
+
+
+def _cached_listdir(path: Path, dirs: bool = True) -> list[str]:
+    """Sorted names of the sub-directories (or files) of path."""
+    if not path.is_dir():
+        return []
+    return list(_scan_dir(path, path.stat().st_mtime_ns, dirs))
+
+
+def _registry() -> dict:
+    return _cached_json(REGISTRY) or {'projects': []}
+
+
+@functools.lru_cache(maxsize=2)
+def _index_registry(mtime_ns: int | None) -> dict:
+    # sort orders and lowercased search keys, computed once per registry version
+    rows = _registry().get('projects', [])
+    n = len(rows)
+    by_kind: dict[str, set[int]] = {}
+    for i, p in enumerate(rows):
+        for k in p.get('kinds') or []:
+            by_kind.setdefault(k, set()).add(i)
+    return {
+        'rows': rows,
+        'by_score': sorted(range(n), key=lambda i: -(rows[i].get('score') or 0)),
+        'by_name': sorted(range(n), key=lambda i: (rows[i].get('name') or '').lower()),
+        'by_path': sorted(range(n), key=lambda i: (rows[i].get('path') or '').lower()),
+        'keys_lower': [p.get('name', '').lower() + ' ' + p.get('path', '').lower() for p in rows],
+        'by_kind': by_kind,
+    }
+
+
+def _registry_index() -> dict:
+    return _index_registry(REGISTRY.stat().st_mtime_ns if REGISTRY.exists() else None)
+
+
+# resolved once at import instead of a loader lookup per request
+TPL = {name: env.get_template(name) for name in os.listdir(ROOT / 'templates') if name.endswith('.html')}
+
+
 def _render(template: str, **ctx):
-    t = env.get_template(template)
-    return HTMLResponse(t.render(**ctx))
+    return HTMLResponse(TPL[template].render(**ctx))
 
 
 @app.get('/')
@@ -51,30 +125,29 @@ def home():
 
 @app.get('/projects', response_class=HTMLResponse)
 def projects_page():
-    data = json.loads(REGISTRY.read_text(encoding='utf-8')) if REGISTRY.exists() else {'projects': []}
+    data = _registry()
     return _render('projects.html', title='matter-hub — Projects', active='projects', count=len(data.get('projects', [])))
 
 
 @app.get('/api/projects')
-def api_projects(q: str | None = None, kind: str | None = None, sort: str = 'score', limit: int = 500):
-    data = json.loads(REGISTRY.read_text(encoding='utf-8')) if REGISTRY.exists() else {'projects': []}
-    rows = data.get('projects', [])
+def api_projects(q: str | None = None, kind: str | None = None, sort: str = 'score', limit: int = 500, offset: int = 0):
+    idx = _registry_index()
+    rows = idx['rows']
+    order = idx['by_name'] if sort == 'name' else idx['by_path'] if sort == 'path' else idx['by_score']
 
+    keep = None
     if q:
         ql = q.lower()
-        rows = [p for p in rows if ql in (p.get('name','').lower() + ' ' + p.get('path','').lower())]
-
+        keep = {i for i, key in enumerate(idx['keys_lower']) if ql in key}
     if kind:
-        rows = [p for p in rows if kind in (p.get('kinds') or [])]
+        in_kind = idx['by_kind'].get(kind, set())
+        keep = in_kind if keep is None else keep & in_kind
+    if keep is not None:
+        order = [i for i in order if i in keep]
 
-    if sort == 'name':
-        rows.sort(key=lambda p: (p.get('name') or '').lower())
-    elif sort == 'path':
-        rows.sort(key=lambda p: (p.get('path') or '').lower())
-    else:
-        rows.sort(key=lambda p: -(p.get('score') or 0))
-
-    return JSONResponse(rows[: max(1, min(int(limit), 2000))])
+    start = max(0, int(offset))
+    end = start + max(1, min(int(limit), 2000))
+    return JSONResponse([rows[i] for i in order[start:end]])
 
 
 @app.get('/search', response_class=HTMLResponse)
@@ -82,31 +155,47 @@ def search_page():
     return _render('search.html', title='matter-hub — Search', active='search')
 
 
+_chat_pool = threading.local()
+
+
+def _chat_conn() -> sqlite3.Connection:
+    """Read-only chatgpt.sqlite connection, one per worker thread (kept open)."""
+    c = getattr(_chat_pool, 'c', None)
+    if c is None:
+        c = sqlite3.connect(str(s.CHAT_DB), check_same_thread=False)
+        c.execute('PRAGMA query_only=1')
+        c.execute('PRAGMA mmap_size=268435456')
+        _chat_pool.c = c
+    return c
+
+
 @app.get('/api/search')
-def api_search(q: str, project: str | None = None, role: str | None = None, top: int = 10, group: int | None = None):
-    # call the underlying search v2 by importing its functions
-    import hub.search as s
+async def api_search(q: str, project: str | None = None, role: str | None = None, top: int = 10, group: int | None = None):
     since = None
     until = None
-    chat = __import__('sqlite3').connect(str(s.CHAT_DB))
-    fts = s.fts_search(chat, q, role, since, until, 25)
-    sem = s.semantic_search(q, role, since, until, 25)
-    merged = s._merge_results(fts, sem, project)
+
+    def run_fts():
+        return s.fts_search(_chat_conn(), q, role, since, until, 25)
+
+    # both searches block on sqlite/Ollama and are independent: run them side by side off the event loop
+    fts, sem = await asyncio.gather(
+        asyncio.to_thread(run_fts),
+        asyncio.to_thread(s.semantic_search, q, role, since, until, 25),
+    )
+    merged = s._merge_hits(fts, sem, project)
     out = {
         'query': q,
         'project': project,
         'role': role,
         'counts': {'fts': len(fts), 'semantic': len(sem), 'merged': len(merged)},
-        'hits': merged[: max(1, min(int(top), 50))],
+        'hits': s._rank_hits(merged.values(), max(1, min(int(top), 50))),
     }
     return JSONResponse(out)
 
 
 @app.get('/canon', response_class=HTMLResponse)
 def canon_page():
-    bundles = []
-    if CANON_DIR.exists():
-        bundles = sorted([p.name for p in CANON_DIR.iterdir() if p.is_dir()])
+    bundles = _cached_listdir(CANON_DIR)
     return _render('canon.html', title='matter-hub — Canon', active='canon', bundles=bundles)
 
 
@@ -115,16 +204,16 @@ def canon_bundle(bundle: str):
     p = CANON_DIR / bundle
     if not p.exists() or not p.is_dir():
         return HTMLResponse('not found', status_code=404)
-    files = sorted([x.name for x in p.iterdir() if x.is_file()])
+    files = _cached_listdir(p, dirs=False)
     return _render('canon_bundle.html', title=f'matter-hub — Canon {bundle}', active='canon', bundle=bundle, path=str(p), files=files)
 
 
 @app.get('/canon/{bundle}/file/{filename}', response_class=HTMLResponse)
-def canon_file(bundle: str, filename: str):
+async def canon_file(bundle: str, filename: str):
     p = CANON_DIR / bundle / filename
     if not p.exists() or not p.is_file():
         return HTMLResponse('not found', status_code=404)
-    content = p.read_text(encoding='utf-8', errors='replace')
+    content = await asyncio.to_thread(p.read_text, encoding='utf-8', errors='replace')
     return _render('canon_file.html', title=f'matter-hub — {bundle}/{filename}', active='canon', bundle=bundle, filename=filename, path=str(p), content=content)
 
 
@@ -6,7 +6,7 @@ Then open:
   http://127.0.0.1:8899/
 
 API:
-  GET /api/events?limit=100&kind=...&status=...&q=...&since=...&until=...
+  GET /api/events?limit=100&kind=...&status=...&q=...&since=...&until=...&since_id=...
   GET /api/events/{id}
 
 Notes:
@@ -16,33 +16,123 @@ Notes:
 
 from __future__ import annotations
 
-import json
+import asyncio
+import functools
 import sqlite3
+import threading
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.responses import StreamingResponse
 
 from action_log import ensure_db
 
+try:
+    import orjson
+except ImportError:  # stdlib encoder via JSONResponse
+    orjson = None
+
+
+class _OrjsonResponse(JSONResponse):
+    """JSONResponse encoded with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
 DB = Path(__file__).resolve().parent / 'actions.sqlite'
 
-app = FastAPI(title='matter-hub ledger')
+app = FastAPI(title='matter-hub ledger', default_response_class=_OrjsonResponse)
+# list pages are repetitive JSON; small bodies and text/event-stream are passed through as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+# per-connection settings; journal_mode=WAL is persistent and already set by ensure_db
+_SESSION_PRAGMAS = """
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+PRAGMA busy_timeout=5000;
+"""
 
 
-def _connect():
-    ensure_db(DB)
-    con = sqlite3.connect(str(DB))
-    con.row_factory = sqlite3.Row
+# long-lived read connections: one per worker thread (sync handlers run in a threadpool),
+# opened lazily and kept for the life of the process. They are query_only: the API never
+# writes, and WAL lets these readers run alongside the action_log writer.
+_local = threading.local()
+_conns: list[sqlite3.Connection] = []
+_conns_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    con = getattr(_local, 'con', None)
+    if con is None:
+        con = sqlite3.connect(str(DB), check_same_thread=False, isolation_level=None, cached_statements=256)
+        con.row_factory = sqlite3.Row
+        con.executescript(_SESSION_PRAGMAS)
+        con.execute('PRAGMA query_only=ON')
+        _local.con = con
+        with _conns_lock:
+            _conns.append(con)
     return con
 
 
-@app.get('/', response_class=HTMLResponse)
-def index():
-    return HTMLResponse(
-        """<!doctype html>
+# planner stats refresh while the server runs (PRAGMA optimize is a no-op when nothing changed)
+_OPTIMIZE_EVERY = 4 * 3600
+
+
+def _optimize(mask: str | None = None):
+    # optimize may ANALYZE (writes sqlite_stat1), so it gets a short-lived writable connection
+    con = sqlite3.connect(str(DB), isolation_level=None)
+    try:
+        con.execute('PRAGMA busy_timeout=5000')
+        con.execute(f'PRAGMA optimize={mask}' if mask else 'PRAGMA optimize')
+    finally:
+        con.close()
+
+
+async def _optimize_loop():
+    while True:
+        await asyncio.sleep(_OPTIMIZE_EVERY)
+        try:
+            await asyncio.to_thread(_optimize)
+        except sqlite3.Error:
+            pass
+
+
+@app.on_event('startup')
+async def _startup():
+    await asyncio.to_thread(ensure_db, DB)
+    # 0x10002: analyze every table that looks stale, not just those used by this connection
+    await asyncio.to_thread(_optimize, '0x10002')
+    app.state.optimize_task = asyncio.create_task(_optimize_loop())
+
+
+@app.on_event('shutdown')
+def _shutdown():
+    task = getattr(app.state, 'optimize_task', None)
+    if task is not None:
+        task.cancel()
+    with _conns_lock:
+        for con in _conns:
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
+        _conns.clear()
+    try:
+        _optimize()
+    except sqlite3.Error:
+        pass
+
+
+# the page is static: encode it once at import rather than on every hit
+_INDEX_BYTES = """<!doctype html>
 <html>
 <head>
   <meta charset="utf-8" />
@@ -181,6 +271,7 @@ function startStream(){
   es.onmessage = (ev) => {
     try{
       const rows = JSON.parse(ev.data);
+      current = rows;
       renderRows(rows);
     } catch(e){}
   };
@@ -245,7 +336,11 @@ function renderRows(rows){
   }
 }
 
-async function loadEvents(){
+// rows currently shown, and the filter string they were loaded with
+let current = [];
+let currentKey = '';
+
+async function loadEvents(delta){
   const kind = document.getElementById('kind').value;
   const status = document.getElementById('status').value;
   const q = document.getElementById('q').value;
@@ -262,11 +357,24 @@ async function loadEvents(){
   if(until) params.set('until', until);
   params.set('limit', limit || '100');
   params.set('sort', sort || 'desc');
+  const key = params.toString();
+
+  // auto-refresh: same filters, newest first and nothing still running (a running row can
+  // change status in place) -> only ask for events newer than the newest row we have
+  const useDelta = delta && key === currentKey && (sort || 'desc') === 'desc'
+    && current.length && !current.some(r => r.status === 'running');
+  if(useDelta) params.set('since_id', Math.max(...current.map(r => r.id)));
 
   const t0 = performance.now();
-  const rows = await api('/api/events?' + params.toString());
+  let rows = await api('/api/events?' + params.toString());
   const t1 = performance.now();
 
+  if(useDelta){
+    if(!rows.length) return;
+    rows = rows.concat(current).slice(0, Number(limit || 100));
+  }
+  current = rows;
+  currentKey = key;
   document.getElementById('meta').textContent = `${rows.length} events • ${(t1-t0).toFixed(0)}ms`;
   renderRows(rows);
 }
@@ -275,102 +383,139 @@ loadEvents();
 startStream();
 setInterval(() => {
   const auto = document.getElementById('autorefresh').checked;
-  if(auto) loadEvents();
+  if(auto) loadEvents(true);
 }, 8000);
 </script>
 </body>
-</html>"""
-    )
+</html>""".encode('utf-8')
 
 
-@app.get('/api/events')
-def api_events(
-    limit: int = 100,
-    kind: Optional[str] = None,
-    status: Optional[str] = None,
-    since: Optional[str] = None,
-    until: Optional[str] = None,
-    q: Optional[str] = None,
-    sort: str = 'desc',
-):
-    limit = max(1, min(int(limit), 2000))
-    con = _connect()
-
-    sql = "SELECT id, ts_start, ts_end, kind, status, seconds, message, tags, params_json, extra_json, error FROM events"
+@app.get('/', response_class=HTMLResponse)
+def index():
+    return HTMLResponse(_INDEX_BYTES)
+
+
+# API payloads built by SQLite: tags/params/extra are stored as JSON text and embedded
+# with json() instead of a json.loads/json.dumps round trip per row
+_EVENT_ROW_JSON = """json_object(
+  'id', id, 'ts_start', ts_start, 'ts_end', ts_end, 'kind', kind, 'status', status,
+  'seconds', seconds, 'message', message, 'tags', json(COALESCE(tags, '[]'))
+)"""
+_EVENT_DETAIL_JSON = """json_object(
+  'id', id, 'ts_start', ts_start, 'ts_end', ts_end, 'kind', kind, 'status', status,
+  'seconds', seconds, 'message', message, 'tags', json(COALESCE(tags, '[]')),
+  'log_path', log_path, 'params', json(COALESCE(params_json, '{}')),
+  'extra', json(COALESCE(extra_json, '{}')), 'error', error
+)"""
+
+
+@functools.lru_cache(maxsize=128)
+def _events_sql(kind: bool, status: bool, since: bool, until: bool, since_id: bool, q_mode: str | None, sort: str) -> str:
+    """SQL text for one filter shape: identical strings let sqlite3's statement cache hit."""
+    sql = f"SELECT {_EVENT_ROW_JSON} AS j FROM events"
     where = []
-    params = []
+
+    if q_mode == 'fts':
+        # trigram FTS: indexed substring match (quoted as one phrase). The CTE keeps the
+        # planner on the FTS side; with no other filter its LIMIT can go inside as well.
+        cte = f'SELECT rowid AS hit FROM events_fts WHERE events_fts MATCH ? ORDER BY rowid {sort.upper()}'
+        if not (kind or status or since or until or since_id):
+            cte += ' LIMIT ?'
+        sql = f'WITH m AS ({cte}) ' + sql + ' JOIN m ON events.id = m.hit'
 
     if kind:
         where.append('kind=?')
-        params.append(kind)
     if status:
         where.append('status=?')
-        params.append(status)
     if since:
         where.append('ts_start>=?')
-        params.append(since)
     if until:
         where.append('ts_start<=?')
-        params.append(until)
-    if q:
-        where.append('(kind LIKE ? OR message LIKE ? OR params_json LIKE ? OR extra_json LIKE ? OR error LIKE ?)')
-        like = f"%{q}%"
-        params.extend([like, like, like, like, like])
+    if since_id:
+        where.append('id>?')
+    if q_mode == 'like':
+        where.append('search_blob LIKE ?')
 
     if where:
         sql += ' WHERE ' + ' AND '.join(where)
 
+    return sql + f' ORDER BY id {sort.upper()} LIMIT ?'
+
+
+def _events_query(limit, kind, status, since, until, q, sort, since_id=None) -> tuple[str, list]:
     if sort not in ('asc','desc'):
         sort = 'desc'
-    sql += f' ORDER BY id {sort.upper()} LIMIT ?'
+    # trigrams need >= 3 chars; shorter terms fall back to a LIKE scan
+    q_mode = None if not q else ('fts' if len(q) >= 3 else 'like')
+    fts_limit = q_mode == 'fts' and not (kind or status or since or until or since_id)
+    sql = _events_sql(bool(kind), bool(status), bool(since), bool(until), bool(since_id), q_mode, sort)
+
+    # bind in the order _events_sql lays out its placeholders
+    params = []
+    if q_mode == 'fts':
+        params.append('"%s"' % q.replace('"', '""'))
+        if fts_limit:
+            params.append(limit)
+    for value in (kind, status, since, until, since_id):
+        if value:
+            params.append(value)
+    if q_mode == 'like':
+        params.append(f"%{q}%")
     params.append(limit)
+    return sql, params
+
 
+def _events_body(con: sqlite3.Connection, sql: str, params: list) -> bytes:
+    # rows arrive as JSON text (SQLite's JSON1 does the encoding); just join them into an array
     rows = con.execute(sql, params).fetchall()
+    return ('[' + ','.join(r[0] for r in rows) + ']').encode('utf-8')
 
-    out = []
-    for r in rows:
-        out.append({
-            'id': r['id'],
-            'ts_start': r['ts_start'],
-            'ts_end': r['ts_end'],
-            'kind': r['kind'],
-            'status': r['status'],
-            'seconds': r['seconds'],
-            'message': r['message'],
-            'tags': json.loads(r['tags'] or '[]'),
-        })
 
-    return JSONResponse(out)
+def _events_version(con: sqlite3.Connection) -> int:
+    r = con.execute("SELECT value FROM meta WHERE key='events_version'").fetchone()
+    return int(r[0]) if r else 0
+
+
+@app.get('/api/events')
+async def api_events(
+    request: Request,
+    limit: int = Query(100, ge=1, le=2000),
+    kind: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: str = 'desc',
+    since_id: Optional[int] = None,
+):
+    # since_id: only events newer than the client's newest row (UI delta refresh)
+    sql, params = _events_query(limit, kind, status, since, until, q, sort, since_id)
+
+    # sqlite3 calls block: run them on worker threads (each has its own connection, see _db)
+    version = await asyncio.to_thread(lambda: _events_version(_db()))
+    # auto-refresh polls mostly ask again for an unchanged ledger: answer those with a 304
+    etag = f'W/"{version}-{hash((sql, tuple(params))) & 0xffffffff:x}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    body = await asyncio.to_thread(lambda: _events_body(_db(), sql, params))
+    return Response(body, media_type='application/json', headers=headers)
 
 
 @app.get('/api/events/{event_id}')
-def api_event(event_id: int):
-    con = _connect()
-    r = con.execute(
-        'SELECT id, ts_start, ts_end, kind, status, seconds, message, tags, log_path, params_json, extra_json, error FROM events WHERE id=?',
-        (event_id,),
-    ).fetchone()
+async def api_event(event_id: int):
+    def fetch():
+        return _db().execute(f'SELECT {_EVENT_DETAIL_JSON} FROM events WHERE id=?', (event_id,)).fetchone()
+
+    r = await asyncio.to_thread(fetch)
     if not r:
-        return JSONResponse({'error': 'not_found'}, status_code=404)
-    return JSONResponse({
-        'id': r['id'],
-        'ts_start': r['ts_start'],
-        'ts_end': r['ts_end'],
-        'kind': r['kind'],
-        'status': r['status'],
-        'seconds': r['seconds'],
-        'message': r['message'],
-        'tags': json.loads(r['tags'] or '[]'),
-        'log_path': r['log_path'],
-        'params': json.loads(r['params_json'] or '{}'),
-        'extra': json.loads(r['extra_json'] or '{}'),
-        'error': r['error'],
-    })
+        return _OrjsonResponse({'error': 'not_found'}, status_code=404)
+    return Response(r[0].encode('utf-8'), media_type='application/json')
 
 
 @app.get('/api/log/{event_id}', response_class=HTMLResponse)
 def api_log(event_id: int):
-    con = _connect()
+    con = _db()
     r = con.execute('SELECT id, log_path FROM events WHERE id=?', (event_id,)).fetchone()
     if not r:
         return HTMLResponse('not found', status_code=404)
@@ -389,7 +534,7 @@ def api_log(event_id: int):
 
 @app.get('/api/stats')
 def api_stats():
-    con = _connect()
+    con = _db()
     total = con.execute('SELECT COUNT(*) AS n FROM events').fetchone()['n']
     by_status = {r['status']: r['n'] for r in con.execute('SELECT status, COUNT(*) AS n FROM events GROUP BY status').fetchall()}
     top_kinds = [dict(r) for r in con.execute('SELECT kind, COUNT(*) AS n FROM events GROUP BY kind ORDER BY n DESC LIMIT 20').fetchall()]
@@ -400,12 +545,12 @@ def api_stats():
     err_rate = 0.0
     if total:
         err_rate = float(by_status.get('error', 0)) / float(total)
-    return JSONResponse({'total': total, 'by_status': by_status, 'top_kinds': top_kinds, 'timeline_24h': timeline, 'error_rate': err_rate})
+    return _OrjsonResponse({'total': total, 'by_status': by_status, 'top_kinds': top_kinds, 'timeline_24h': timeline, 'error_rate': err_rate})
 
 
 @app.get('/api/stream')
 def api_stream(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=2000),
     kind: Optional[str] = None,
     status: Optional[str] = None,
     since: Optional[str] = None,
@@ -413,19 +558,20 @@ def api_stream(
     q: Optional[str] = None,
     sort: str = 'desc',
 ):
-    def gen():
-        import time
+    sql, params = _events_query(limit, kind, status, since, until, q, sort)
+
+    # async generator: an open stream waits on the event loop, not on a threadpool worker
+    async def gen():
         last = None
         while True:
             try:
-                rows = api_events(limit=limit, kind=kind, status=status, since=since, until=until, q=q, sort=sort).body
-                # api_events returns JSONResponse; .body is bytes
+                rows = await asyncio.to_thread(lambda: _events_body(_db(), sql, params))
                 if rows != last:
                     last = rows
                     yield f"data: {rows.decode('utf-8')}\n\n"
             except Exception as e:
                 yield f"data: []\n\n"
-            time.sleep(1.5)
+            await asyncio.sleep(1.5)
 
     return StreamingResponse(gen(), media_type='text/event-stream')
 
@@ -49,10 +49,10 @@ def main():
             env[k] = v
 
     with log_event(args.kind, params={'cmd': cmd, 'cwd': args.cwd}, message=args.message, tags=args.tag, log_path=str(log_path)) as ev:
-        with open(log_path, 'w', encoding='utf-8', errors='replace') as f:
-            f.write(f"$ {' '.join(cmd)}\n")
-            f.flush()
-            p = subprocess.Popen(cmd, cwd=args.cwd, env=env, stdout=f, stderr=subprocess.STDOUT, text=True)
+        # unbuffered binary file: the header is on disk before the child starts writing to the same fd
+        with open(log_path, 'wb', buffering=0) as f:
+            f.write(f"$ {' '.join(cmd)}\n".encode('utf-8'))
+            p = subprocess.Popen(cmd, cwd=args.cwd, env=env, stdout=f, stderr=subprocess.STDOUT)
             rc = p.wait()
             if rc == 0:
                 ev.ok(extra={'returncode': rc})
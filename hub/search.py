@@ -22,17 +22,47 @@ Returns JSON.
 from __future__ import annotations
 
 import argparse
+import functools
+import hashlib
+import heapq
 import json
 import math
+import re
 import sqlite3
 import struct
+import threading
 import time
 import urllib.request
+from concurrent.futures import Future
 from datetime import datetime, timezone
 from pathlib import Path
 
 from action_log import log_event
 
+try:
+    import orjson
+
+    def _dumps(o) -> str:
+        return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def _dumps_pretty(o) -> bytes:
+        return orjson.dumps(o, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+except ImportError:  # stdlib fallback, same output modulo whitespace
+    def _dumps(o) -> str:
+        return json.dumps(o, ensure_ascii=False)
+
+    def _dumps_pretty(o) -> bytes:
+        return json.dumps(o, ensure_ascii=False, indent=2).encode('utf-8')
+
+    _loads = json.loads
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback (list-based unpack_f32 + cosine)
+    np = None
+
 BASE = 'http://127.0.0.1:11434'
 EMBED_MODEL = 'nomic-embed-text:latest'
 
@@ -40,6 +70,41 @@ CHAT_DB = Path(__file__).resolve().parent / 'chatgpt.sqlite'
 SEM_DB = Path(__file__).resolve().parent / 'semantic.sqlite'
 TAGS_RULES = Path(__file__).resolve().parent / 'project_tags.json'
 
+# one connection per (thread, db), opened on first use and kept for the process
+_conns = threading.local()
+_READ_PRAGMAS = (
+    "PRAGMA mmap_size=1073741824;"
+    "PRAGMA cache_size=-262144;"
+    "PRAGMA temp_store=MEMORY;"
+)
+
+
+def _connect(db: Path, query_only: bool) -> sqlite3.Connection:
+    pool = _conns.__dict__.setdefault('pool', {})
+    con = pool.get(str(db))
+    if con is None:
+        con = sqlite3.connect(str(db))
+        con.executescript(_READ_PRAGMAS)
+        if query_only:
+            con.execute('PRAGMA query_only=ON')
+        pool[str(db)] = con
+    return con
+
+
+def _get_chat() -> sqlite3.Connection:
+    return _connect(CHAT_DB, query_only=True)
+
+
+def _get_sem(db: Path | None = None) -> sqlite3.Connection:
+    return _connect(db or SEM_DB, query_only=True)
+
+
+def _get_cache(db: Path | None = None) -> sqlite3.Connection:
+    """semantic.cache.sqlite next to db: query caches are written on every search, and keeping
+    them out of semantic.sqlite keeps its mtime (the _corpus cache key) stable."""
+    db = db or SEM_DB
+    return _connect(db.with_name(db.stem + '.cache' + db.suffix), query_only=False)
+
 
 def _parse_time(s: str | None) -> float | None:
     if not s:
@@ -69,46 +134,108 @@ def _parse_time(s: str | None) -> float | None:
         return None
 
 
-def _load_project_rules():
-    if not TAGS_RULES.exists():
-        return []
+def _load_project_rules() -> tuple:
+    """((tag, (lowercased patterns...)), ...) from project_tags.json, re-read only when the file changes."""
+    try:
+        mtime_ns = TAGS_RULES.stat().st_mtime_ns
+    except OSError:
+        return ()
+    return _read_project_rules(mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def _read_project_rules(mtime_ns: int) -> tuple:
     try:
-        data = json.loads(TAGS_RULES.read_text(encoding='utf-8'))
-        return data.get('projects', [])
+        data = _loads(TAGS_RULES.read_bytes())
+        return tuple(
+            (proj.get('tag'), tuple(pat.lower() for pat in proj.get('patterns', []) if pat))
+            for proj in data.get('projects', [])
+        )
     except Exception:
-        return []
+        return ()
+
+
+@functools.lru_cache(maxsize=1)
+def _compile_matchers(rules: tuple) -> tuple:
+    return tuple((tag, re.compile('|'.join(map(re.escape, pats)))) for tag, pats in rules if tag and pats)
+
 
+def _project_matchers() -> tuple:
+    """((tag, regex), ...) with one compiled alternation of the patterns per project."""
+    return _compile_matchers(_load_project_rules())
 
-def _detect_projects(text: str) -> list[str]:
+
+def _detect_projects(text: str, matchers: tuple | None = None) -> list[str]:
     low = (text or '').lower()
     tags: list[str] = []
-    for proj in _load_project_rules():
-        tag = proj.get('tag')
-        for pat in proj.get('patterns', []):
-            if pat and pat.lower() in low:
-                if tag and tag not in tags:
-                    tags.append(tag)
-                break
+    for tag, rx in _project_matchers() if matchers is None else matchers:
+        if tag not in tags and rx.search(low):
+            tags.append(tag)
     return tags
 
 
-def ollama_embed(text: str):
-    payload = json.dumps({'model': EMBED_MODEL, 'prompt': text}).encode('utf-8')
+def _embed_request(text: str):
+    payload = _dumps({'model': EMBED_MODEL, 'prompt': text}).encode('utf-8')
     req = urllib.request.Request(BASE + '/api/embeddings', data=payload, headers={'Content-Type': 'application/json'})
     with urllib.request.urlopen(req, timeout=600) as r:
-        out = json.loads(r.read().decode('utf-8'))
+        out = _loads(r.read())
     v = out.get('embedding')
     if not v:
         raise RuntimeError('empty embedding')
     return [float(x) for x in v]
 
 
+# Exact-hit cache of query embeddings (semantic.cache.sqlite, table query_cache).
+_QCACHE_MAX = 10_000
+_QCACHE_TTL = 30 * 86400
+
+
+def ollama_embed(text: str, db: Path | None = None):
+    """Embedding of text, served from query_cache when the same (model, text) was embedded before."""
+    key = hashlib.sha256((EMBED_MODEL + '\0' + text).encode('utf-8')).digest()
+    now = time.time()
+    try:
+        con = _get_cache(db)
+        con.execute("CREATE TABLE IF NOT EXISTS query_cache(key BLOB PRIMARY KEY, v BLOB, ts REAL)")
+        row = con.execute("SELECT v FROM query_cache WHERE key=?", (key,)).fetchone()
+        if row:
+            with con:
+                con.execute("UPDATE query_cache SET ts=? WHERE key=?", (now, key))
+            return unpack_f32(row[0])
+    except sqlite3.Error:
+        return _embed_request(text)
+
+    v = _embed_request(text)
+    try:
+        with con:
+            con.execute(
+                "INSERT OR REPLACE INTO query_cache(key, v, ts) VALUES (?,?,?)",
+                (key, struct.pack('<' + 'f' * len(v), *v), now),
+            )
+            con.execute(
+                "DELETE FROM query_cache WHERE ts < ? OR rowid NOT IN "
+                "(SELECT rowid FROM query_cache ORDER BY ts DESC LIMIT ?)",
+                (now - _QCACHE_TTL, _QCACHE_MAX),
+            )
+    except sqlite3.Error:
+        pass  # cache is best effort (e.g. db locked by the indexer)
+    return v
+
+
 def unpack_f32(blob: bytes):
+    if np is not None:
+        return np.frombuffer(blob, dtype='<f4')  # zero-copy view
     n = len(blob) // 4
     return list(struct.unpack('<' + 'f' * n, blob))
 
 
 def cosine(a, b):
+    if np is not None:
+        a = np.asarray(a, dtype='<f4')
+        b = np.asarray(b, dtype='<f4')
+        na = float(np.linalg.norm(a))
+        nb = float(np.linalg.norm(b))
+        return 0.0 if na == 0.0 or nb == 0.0 else float(a @ b) / (na * nb)
     dot = 0.0
     na = 0.0
     nb = 0.0
@@ -121,18 +248,24 @@ def cosine(a, b):
     return dot / (math.sqrt(na) * math.sqrt(nb))
 
 
+# column weights for messages_fts (message_id, conversation_id, author_role, created_at, content_text)
+_FTS_RANK = 'bm25(1.0, 1.0, 1.0, 1.0, 2.0)'
+
+
 def fts_search(con, query: str, role: str | None, since: float | None, until: float | None, limit: int):
-    # messages_fts: message_id, conversation_id, author_role, created_at, content_text
+    # rank is the weighted bm25 (content_text x2) computed by the FTS5 MATCH iterator;
+    # equal ranks fall back to recency then rowid, as before, inside the LIMIT top-N sort
     sql = (
         "SELECT message_id, conversation_id, author_role, created_at, "
-        "snippet(messages_fts, 4, '[', ']', '…', 18) AS snip, bm25(messages_fts) AS bm25 "
-        "FROM messages_fts WHERE messages_fts MATCH ?"
+        "snippet(messages_fts, 4, '[', ']', '…', 18) AS snip, rank AS bm25 "
+        "FROM messages_fts WHERE messages_fts MATCH ? AND rank MATCH ?"
     )
     params: list[object] = []
 
     # quote if query has spaces
     match = '"%s"' % query.replace('"', '') if ' ' in query else query
     params.append(match)
+    params.append(_FTS_RANK)
 
     if role:
         sql += " AND author_role=?"
@@ -146,49 +279,356 @@ def fts_search(con, query: str, role: str | None, since: float | None, until: fl
         sql += " AND CAST(created_at AS REAL) <= ?"
         params.append(float(until))
 
-    # better ranking: bm25 first, then recency
-    sql += " ORDER BY bm25 ASC, CAST(created_at AS REAL) DESC LIMIT ?"
+    sql += " ORDER BY rank, CAST(created_at AS REAL) DESC, rowid DESC LIMIT ?"
     params.append(int(limit))
 
     return con.execute(sql, params).fetchall()
 
 
-def semantic_search(query: str, role: str | None, since: float | None, until: float | None, top: int, min_len: int = 120):
-    qv = ollama_embed(query)
-    con = sqlite3.connect(str(SEM_DB))
-    rows = con.execute(
-        "SELECT v.id, v.v, d.meta_json, d.text FROM vecs v JOIN docs d ON d.id=v.id"
-    ).fetchall()
+def _as_ts(created_at) -> float | None:
+    try:
+        return float(created_at) if created_at is not None else None
+    except Exception:
+        return None
 
-    scored = []
-    for mid, blob, meta_json, text in rows:
-        if not text or len(text) < min_len:
-            continue
-        meta = json.loads(meta_json) if meta_json else {}
-        rrole = meta.get('author_role')
-        created_at = meta.get('created_at')
 
-        if role and rrole != role:
-            continue
+def _match(author_role, ts: float | None, role: str | None, since: float | None, until: float | None) -> bool:
+    if role and author_role != role:
+        return False
+    if since is not None and ts is not None and ts < since:
+        return False
+    if until is not None and ts is not None and ts > until:
+        return False
+    return True
 
-        try:
-            ts = float(created_at) if created_at is not None else None
-        except Exception:
-            ts = None
 
-        if since is not None and ts is not None and ts < since:
-            continue
-        if until is not None and ts is not None and ts > until:
-            continue
+def _keep(meta: dict, role: str | None, since: float | None, until: float | None) -> bool:
+    return _match(meta.get('author_role'), _as_ts(meta.get('created_at')), role, since, until)
+
+
+def _has_filter_cols(con) -> bool:
+    """docs carries author_role/created_at/text_len (semantic_index.py backfills older indexes)."""
+    return 'text_len' in {r[1] for r in con.execute('PRAGMA table_info(docs)')}
+
+
+# same semantics as _keep: rows without a timestamp pass the time filters;
+# min_len <= 0 keeps empty-text rows too
+_DOC_FILTER_SQL = (
+    "COALESCE(d.text_len, 0) >= ? AND (? IS NULL OR d.author_role = ?)"
+    " AND (? IS NULL OR d.created_at IS NULL OR d.created_at >= ?)"
+    " AND (? IS NULL OR d.created_at IS NULL OR d.created_at <= ?)"
+)
+
 
-        v = unpack_f32(blob)
-        s = cosine(qv, v)
-        scored.append((s, mid, meta, text))
+def _doc_filter_params(role: str | None, since: float | None, until: float | None, min_len: int) -> tuple:
+    return (min_len, role or None, role or None, since, since, until, until)
 
-    scored.sort(key=lambda x: x[0], reverse=True)
+
+def _top_k(scores, k: int):
+    """Indices of the k best scores, best first (argpartition, no full sort)."""
+    k = min(k, scores.size)
+    if k <= 0:
+        return []
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _unit_norm(con) -> bool:
+    """True when every stored vector is L2-normalized (meta.unit_norm, see semantic_normalize.py)."""
+    try:
+        row = con.execute("SELECT value FROM meta WHERE key='unit_norm'").fetchone()
+    except sqlite3.OperationalError:  # index older than the meta table
+        return False
+    return bool(row and row[0] == '1')
+
+
+def _mtime_ns(db: Path) -> int:
+    # WAL-mode writers may only touch the -wal file until the next checkpoint
+    wal = db.with_name(db.name + '-wal')
+    return max((p.stat().st_mtime_ns for p in (db, wal) if p.exists()), default=0)
+
+
+# rows upcast to float32 per matmul when scanning the int8 corpus
+_SCAN_ROWS = 16384
+# rows per fetchmany when streaming vectors out of semantic.sqlite
+_FETCH_ROWS = 4096
+
+# coarse='bin': rows kept per final hit by the Hamming prefilter before f32 rescoring
+_BIN_SHORTLIST = 10
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8) if np is not None else None
+
+
+class _Corpus:
+    """Every vector of a semantic.sqlite as one int8 matrix (one scale per row).
+
+    Row i of Q is ids[i]; roles (int codes, see role_codes), ts (NaN when
+    unknown) and lens are NumPy columns, so the filters are one boolean mask
+    and a query is one matrix-vector product instead of a Python cosine per row. The int8 rows
+    come from vecs_i8 (written by semantic_index.py); vectors indexed before
+    that table existed are quantized from their float32 blob at load. Texts
+    and meta_json stay in the DB and are only fetched for the hits. The f32
+    rows used for rescoring are read from the memory-mapped <db>.vecs file
+    (offs[i] = float index of row i, -1 if absent) instead of vecs.v blobs. When the index is
+    unit-norm (unit=True) cosine is the plain dot and no row norms are computed.
+    The 1-bit codes for the Hamming prefilter (vecs_b) are only loaded on the
+    first coarse='bin' query, see bits().
+    """
+
+    def __init__(self, db: Path):
+        self.db = db
+        self._bits = None
+        con = _get_sem(db)
+        self.unit = _unit_norm(con)
+        has_i8 = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='vecs_i8'").fetchone()
+        i8 = 'q.scale, q.q, CASE WHEN q.q IS NULL THEN v.v END' if has_i8 else 'NULL, NULL, v.v'
+        join = 'LEFT JOIN vecs_i8 q ON q.id=v.id' if has_i8 else ''
+        if _has_filter_cols(con):
+            cols = 'd.author_role, d.created_at, d.text_len'
+        else:  # index built before the filter columns: read them out of meta_json
+            cols = "json_extract(d.meta_json, '$.author_role'), json_extract(d.meta_json, '$.created_at'), length(d.text)"
+        cur = con.execute(f'SELECT v.id, {cols}, {i8} FROM vecs v JOIN docs d ON d.id=v.id {join}')
+        cur.arraysize = _FETCH_ROWS
+        # stream the rows: only one chunk of blob tuples is alive at a time
+        self.ids, roles, ts, lens, Qs, scales = [], [], [], [], [], []
+        self.role_codes: dict = {}
+        dim = None
+        while True:
+            chunk = cur.fetchmany()
+            if not chunk:
+                break
+            if dim is None:
+                dim = len(chunk[0][5]) if chunk[0][5] is not None else len(chunk[0][6]) // 4
+            Qc = np.empty((len(chunk), dim), dtype=np.int8)
+            sc = np.empty(len(chunk), dtype=np.float32)
+            for i, (mid, role, created_at, n, scale, q, blob) in enumerate(chunk):
+                self.ids.append(mid)
+                roles.append(self.role_codes.setdefault(role, len(self.role_codes)))
+                ts.append(_as_ts(created_at))
+                lens.append(n or 0)
+                if q is not None:
+                    Qc[i] = np.frombuffer(q, dtype=np.int8)
+                    sc[i] = scale
+                else:
+                    v = np.frombuffer(blob, dtype='<f4')
+                    sc[i] = float(np.abs(v).max(initial=0.0)) / 127.0 or 1.0
+                    Qc[i] = np.rint(v / sc[i]).astype(np.int8)
+            Qs.append(Qc)
+            scales.append(sc)
+        dim = dim or 0
+        self.roles = np.array(roles, dtype=np.int32)
+        self.ts = np.array(ts, dtype=np.float64)  # None -> NaN
+        self.lens = np.array(lens, dtype=np.int64)
+        self.Q = np.concatenate(Qs) if Qs else np.empty((0, dim), dtype=np.int8)
+        self.scales = np.concatenate(scales) if scales else np.empty(0, dtype=np.float32)
+        has_off = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='vecs_off'").fetchone()
+        offs = dict(con.execute('SELECT id, off FROM vecs_off')) if has_off else {}
+        self.vecs = None
+        self.offs = np.full(len(self.ids), -1, dtype=np.int64)
+        path = db.with_suffix('.vecs')
+        size = path.stat().st_size if offs and path.exists() else 0
+        if size:
+            self.vecs = np.memmap(str(path), dtype='<f4', mode='r')
+            for i, mid in enumerate(self.ids):
+                off = offs.get(mid)
+                if off is not None and off + 4 * dim <= size:
+                    self.offs[i] = off // 4
+
+        if self.unit:
+            self.weights = self.scales
+            return
+        # cosine needs |v|: use the norm of the dequantized row (zero rows score 0)
+        norms = np.sqrt(np.einsum('ij,ij->i', self.Q, self.Q, dtype=np.float64)) * self.scales
+        norms[norms == 0.0] = np.inf
+        self.weights = (self.scales / norms).astype(np.float32)
+
+    def mask(self, role: str | None, since: float | None, until: float | None, min_len: int):
+        """Rows passing the same filters as _match (rows without a timestamp pass the time ones)."""
+        m = self.lens >= min_len
+        if role:
+            code = self.role_codes.get(role)
+            if code is None:
+                return np.zeros(len(self.ids), dtype=bool)
+            m &= self.roles == code
+        if since is not None:
+            m &= ~(self.ts < since)  # NaN compares False, so unknown ts is kept
+        if until is not None:
+            m &= ~(self.ts > until)
+        return m
+
+    def bits(self):
+        """(N, ceil(dim/8)) uint8 sign codes (v > mean(v)), packed like np.packbits."""
+        if self._bits is None:
+            # rows indexed before vecs_b existed: same code from the int8 row (positive scale)
+            B = np.packbits(self.Q > self.Q.mean(axis=1, keepdims=True), axis=1)
+            con = _get_sem(self.db)
+            if con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='vecs_b'").fetchone():
+                pos = {mid: i for i, mid in enumerate(self.ids)}
+                for mid, b in con.execute('SELECT id, b FROM vecs_b'):
+                    i = pos.get(mid)
+                    if i is not None and len(b) == B.shape[1]:
+                        B[i] = np.frombuffer(b, dtype=np.uint8)
+            self._bits = B
+        return self._bits
+
+    def hamming(self, qb, rows):
+        """Hamming distance of the packed query code qb to each of rows."""
+        x = np.bitwise_xor(self.bits()[rows], qb)
+        if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0: POPCNT
+            return np.bitwise_count(x).sum(axis=1, dtype=np.int32)
+        return _POPCOUNT8[x].sum(axis=1, dtype=np.int32)
+
+    def scores(self, q, rows=None):
+        """Cosine with the unit query q (float32, not quantized) of every row, or of rows only."""
+        # NumPy has no BLAS kernel for int8, so dequantize a block at a time
+        # and let SGEMV do the dot products; the full matrix is never upcast
+        n = len(self.ids) if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+        for i in range(0, n, _SCAN_ROWS):
+            block = self.Q[i:i + _SCAN_ROWS] if rows is None else self.Q[rows[i:i + _SCAN_ROWS]]
+            out[i:i + _SCAN_ROWS] = block.astype(np.float32) @ q
+        return out * (self.weights if rows is None else self.weights[rows])
+
+
+@functools.lru_cache(maxsize=2)
+def _load_corpus(db: str, mtime_ns: int) -> _Corpus:
+    return _Corpus(Path(db))
+
+
+def _corpus(db: Path) -> _Corpus:
+    """Corpus for db, reloaded only when the DB (or its WAL) has changed."""
+    return _load_corpus(str(db), _mtime_ns(db))
+
+
+def semantic_hits(qv, role: str | None, since: float | None, until: float | None, top: int, min_len: int = 120, db: Path | None = None, rescore_multiplier: int = 2, coarse: str = 'i8'):
+    """Best (score, id, meta, text) rows for the query vector qv, best first (db defaults to SEM_DB).
+
+    Rows with shorter text than min_len are skipped; min_len=0 ranks every row, empty text included.
+    The int8 scan shortlists rescore_multiplier*top rows, which are re-ranked on their f32 vectors
+    (rescore_multiplier=0 keeps the int8 scores as is). coarse='bin' shortlists
+    _BIN_SHORTLIST*top rows by Hamming distance on 1-bit codes instead, then always rescores.
+    """
+    db = db or SEM_DB
+    if np is None:
+        con = _get_sem(db)
+        unit = _unit_norm(con)
+        if _has_filter_cols(con):
+            cur = con.execute(
+                f"SELECT v.id, v.v, NULL, NULL FROM vecs v JOIN docs d ON d.id=v.id WHERE {_DOC_FILTER_SQL}",
+                _doc_filter_params(role, since, until, min_len),
+            )
+            keep = None
+        else:
+            cur = con.execute(
+                "SELECT v.id, v.v, d.meta_json, length(d.text) FROM vecs v JOIN docs d ON d.id=v.id"
+            )
+            keep = _keep
+        cur.arraysize = _FETCH_ROWS
+        if unit:
+            # unit-norm index: normalize the query once, then cosine == dot
+            qn = math.sqrt(sum(x * x for x in qv))
+            qv = [x / qn for x in qv] if qn else qv
+
+        # stream the rows into a running top-k heap of (score, -seq, id);
+        # -seq keeps the earliest row on ties, like a stable sort would
+        heap: list = []
+        seq = 0
+        while True:
+            chunk = cur.fetchmany()
+            if not chunk:
+                break
+            for mid, blob, meta_json, n in chunk:
+                seq += 1
+                if keep:
+                    if (n or 0) < min_len:
+                        continue
+                    if not keep(_loads(meta_json) if meta_json else {}, role, since, until):
+                        continue
+                v = unpack_f32(blob)
+                s = sum(x * y for x, y in zip(qv, v)) if unit else cosine(qv, v)
+                item = (s, -seq, mid)
+                if len(heap) < top:
+                    heapq.heappush(heap, item)
+                elif heap and item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        best = sorted(heap, reverse=True)
+        ids = [mid for _, _, mid in best]
+        docs = {
+            mid: (text, meta_json)
+            for mid, text, meta_json in con.execute(f"SELECT id, text, meta_json FROM docs WHERE id IN ({','.join('?' * len(ids))})", ids)
+        }
+        out = []
+        for s, _, mid in best:
+            text, meta_json = docs.get(mid, (None, None))
+            out.append((s, mid, _loads(meta_json) if meta_json else {}, text or ''))
+        return out
+
+    c = _corpus(db)
+    if not c.ids:
+        return []
+    q = np.asarray(qv, dtype=np.float32)
+    qn = float(np.linalg.norm(q))
+
+    cand = np.flatnonzero(c.mask(role, since, until, min_len))
+    if not cand.size:
+        return []
+    rescore = coarse == 'bin' or rescore_multiplier >= 1
+    if coarse == 'bin':
+        # the Hamming distance on 1-bit codes only shortlists; the f32 rescoring below ranks
+        qb = np.packbits(q > q.mean())
+        short = cand[_top_k(-c.hamming(qb, cand), _BIN_SHORTLIST * top)]
+    else:
+        # a tight filter scores only its rows; otherwise the contiguous full scan is cheaper
+        if cand.size < len(c.ids) // 2:
+            scores = c.scores(q / qn if qn else q, cand)
+        else:
+            scores = c.scores(q / qn if qn else q)[cand]
+        if rescore:
+            # int8 scores only pick the shortlist; the exact f32 cosine decides the order
+            short = cand[_top_k(scores, rescore_multiplier * top)]
+        else:
+            pos = _top_k(scores, top)
+            hits = cand[pos]
+            final = {i: float(s) for i, s in zip(hits, scores[pos])}
+    if rescore:
+        short_ids = [c.ids[i] for i in short]
+
+    con = _get_sem(db)
+    if rescore:
+        offs = c.offs[short]
+        if c.vecs is not None and (offs >= 0).all():
+            V = c.vecs[offs[:, None] + np.arange(c.Q.shape[1])]
+        else:
+            blobs = dict(con.execute(f"SELECT id, v FROM vecs WHERE id IN ({','.join('?' * len(short_ids))})", short_ids))
+            V = np.stack([np.frombuffer(blobs[mid], dtype='<f4') for mid in short_ids])
+        exact = V @ (q / qn if qn else q)
+        if not c.unit:
+            norms = np.linalg.norm(V, axis=1)
+            norms[norms == 0] = np.inf
+            exact /= norms
+        order = np.argsort(-exact, kind='stable')[:top]
+        hits = short[order]
+        final = {short[j]: float(exact[j]) for j in order}
+
+    # only the hits need their text and meta
+    hit_ids = [c.ids[i] for i in hits]
+    docs = {
+        mid: (text, meta_json)
+        for mid, text, meta_json in con.execute(f"SELECT id, text, meta_json FROM docs WHERE id IN ({','.join('?' * len(hit_ids))})", hit_ids)
+    }
+    out = []
+    for i in hits:
+        text, meta_json = docs.get(c.ids[i], (None, None))
+        out.append((final[i], c.ids[i], _loads(meta_json) if meta_json else {}, text or ''))
+    return out
+
+
+def semantic_search(query: str, role: str | None, since: float | None, until: float | None, top: int, min_len: int = 120, rescore_multiplier: int = 2, qv=None, coarse: str = 'i8'):
+    if qv is None:
+        qv = ollama_embed(query)
 
     out = []
-    for s, mid, meta, text in scored[:top]:
+    for s, mid, meta, text in semantic_hits(qv, role, since, until, top, min_len, rescore_multiplier=rescore_multiplier, coarse=coarse):
         out.append({
             'score': round(float(s), 4),
             'id': mid,
@@ -206,13 +646,15 @@ def _normalize_bm25(bm25: float) -> float:
     return 1.0 / (1.0 + bm25)
 
 
-def _merge_results(fts_rows, sem_rows, project: str | None):
+def _merge_hits(fts_rows, sem_rows, project: str | None) -> dict[str, dict]:
+    """FTS + semantic rows merged by message id (unsorted)."""
     merged: dict[str, dict] = {}
+    matchers = _project_matchers()  # once per call, not per row
 
     for mid, cid, role, created_at, snip, bm25 in fts_rows:
         score = _normalize_bm25(bm25)
         text = str(snip)
-        tags = _detect_projects(text)
+        tags = _detect_projects(text, matchers)
         if project and project not in tags:
             continue
         merged[mid] = {
@@ -229,7 +671,7 @@ def _merge_results(fts_rows, sem_rows, project: str | None):
     for item in sem_rows:
         mid = item['id']
         text = item.get('text') or ''
-        tags = _detect_projects(text)
+        tags = _detect_projects(text, matchers)
         if project and project not in tags:
             continue
         if mid in merged:
@@ -255,18 +697,28 @@ def _merge_results(fts_rows, sem_rows, project: str | None):
                 'tags': tags,
             }
 
-    # sort by score desc, then recency desc if numeric
-    def key(x):
-        ca = x.get('created_at')
-        try:
-            ts = float(ca)
-        except Exception:
-            ts = -1.0
-        return (-float(x.get('score') or 0.0), -ts)
+    return merged
+
+
+def _rank_key(x):
+    # score desc, then recency desc if numeric
+    ca = x.get('created_at')
+    try:
+        ts = float(ca)
+    except Exception:
+        ts = -1.0
+    return (-float(x.get('score') or 0.0), -ts)
 
-    items = list(merged.values())
-    items.sort(key=key)
-    return items
+
+def _rank_hits(items, top: int | None = None) -> list[dict]:
+    """Merged hits best first; with top, only the best top (heap select, no full sort)."""
+    if top is None:
+        return sorted(items, key=_rank_key)
+    return heapq.nsmallest(top, items, key=_rank_key)
+
+
+def _merge_results(fts_rows, sem_rows, project: str | None, top: int | None = None):
+    return _rank_hits(_merge_hits(fts_rows, sem_rows, project).values(), top)
 
 
 def _group_by_conversation(items: list[dict], convos: int, per_convo: int):
@@ -284,6 +736,82 @@ def _group_by_conversation(items: list[dict], convos: int, per_convo: int):
     return out
 
 
+# Near-duplicate query cache (semantic.cache.sqlite, table query_cache_sem): a past search with the
+# same filters whose query embedding is within cosine _SEM_CACHE_SIM is answered from its stored result.
+_SEM_CACHE_SIM = 0.95
+_SEM_CACHE_MAX = 500
+_SEM_CACHE_TTL = 86400
+
+
+def _sem_cache_get(qv, params: str, db: Path | None = None):
+    """(similarity, result) of the closest cached search with the same params, or None below the threshold."""
+    try:
+        con = _get_cache(db)
+        con.execute("CREATE TABLE IF NOT EXISTS query_cache_sem(key INTEGER PRIMARY KEY, params TEXT, qv BLOB, hits_json TEXT, ts REAL)")
+        rows = con.execute(
+            "SELECT key, qv FROM query_cache_sem WHERE params=? AND ts >= ? AND length(qv)=?",
+            (params, time.time() - _SEM_CACHE_TTL, 4 * len(qv)),
+        ).fetchall()
+        if not rows:
+            return None
+
+        if np is None:
+            sims = [cosine(qv, unpack_f32(blob)) for _, blob in rows]
+            best = max(range(len(sims)), key=sims.__getitem__)
+            sim = sims[best]
+        else:
+            C = np.frombuffer(b''.join(blob for _, blob in rows), dtype='<f4').reshape(len(rows), -1)
+            q = np.asarray(qv, dtype=np.float32)
+            norms = np.linalg.norm(C, axis=1) * float(np.linalg.norm(q))
+            norms[norms == 0] = np.inf
+            sims = (C @ q) / norms
+            best = int(np.argmax(sims))
+            sim = float(sims[best])
+        if sim < _SEM_CACHE_SIM:
+            return None
+
+        key = rows[best][0]
+        hits_json = con.execute("SELECT hits_json FROM query_cache_sem WHERE key=?", (key,)).fetchone()[0]
+        with con:
+            con.execute("UPDATE query_cache_sem SET ts=? WHERE key=?", (time.time(), key))
+        return sim, _loads(hits_json)
+    except sqlite3.Error:
+        return None
+
+
+def _sem_cache_put(qv, params: str, result: dict, db: Path | None = None):
+    now = time.time()
+    try:
+        con = _get_cache(db)
+        con.execute("CREATE TABLE IF NOT EXISTS query_cache_sem(key INTEGER PRIMARY KEY, params TEXT, qv BLOB, hits_json TEXT, ts REAL)")
+        with con:
+            con.execute(
+                "INSERT INTO query_cache_sem(params, qv, hits_json, ts) VALUES (?,?,?,?)",
+                (params, struct.pack('<' + 'f' * len(qv), *qv), _dumps(result), now),
+            )
+            con.execute(
+                "DELETE FROM query_cache_sem WHERE ts < ? OR key NOT IN "
+                "(SELECT key FROM query_cache_sem ORDER BY ts DESC LIMIT ?)",
+                (now - _SEM_CACHE_TTL, _SEM_CACHE_MAX),
+            )
+    except sqlite3.Error:
+        pass  # best effort, like query_cache
+
+
+def _in_background(fn, *args) -> Future:
+    """Run fn(*args) on a daemon thread, so an early return from main() never waits for it."""
+    fut: Future = Future()
+
+    def run():
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return fut
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('query')
@@ -294,9 +822,12 @@ def main():
     ap.add_argument('--fts', type=int, default=25)
     ap.add_argument('--sem', type=int, default=25)
     ap.add_argument('--top', type=int, default=15)
+    ap.add_argument('--rescore-multiplier', type=int, default=2, help='f32 rescoring of the top sem*N int8 hits (0 = off)')
+    ap.add_argument('--coarse', choices=('i8', 'bin'), default='i8', help='first-stage scan: int8 dot or 1-bit Hamming')
     ap.add_argument('--group', action='store_true', help='group results by conversation_id')
     ap.add_argument('--convos', type=int, default=10)
     ap.add_argument('--per-convo', type=int, default=5)
+    ap.add_argument('--no-sem-cache', action='store_true', help='always run the search (skip the near-duplicate query cache)')
     args = ap.parse_args()
 
     since = _parse_time(args.since)
@@ -313,16 +844,34 @@ def main():
             'fts': args.fts,
             'sem': args.sem,
             'top': args.top,
+            'rescore_multiplier': args.rescore_multiplier,
+            'coarse': args.coarse,
             'group': args.group,
         },
         message=f"Search v2: {args.query}",
         tags=['search'] + ([args.project] if args.project else []),
     ) as ev:
         t0 = time.time()
-        chat = sqlite3.connect(str(CHAT_DB))
-        fts = fts_search(chat, args.query, args.role, since, until, args.fts)
-        sem = semantic_search(args.query, args.role, since, until, args.sem)
-        merged = _merge_results(fts, sem, args.project)
+        # FTS and the corpus load don't need the query vector: run them while Ollama embeds it
+        f_fts = _in_background(lambda: fts_search(_get_chat(), args.query, args.role, since, until, args.fts))
+        f_corpus = _in_background(_corpus, SEM_DB) if np is not None else None
+        qv = ollama_embed(args.query)
+        cache_params = json.dumps({
+            'model': EMBED_MODEL,
+            'role': args.role,
+            'since': since,
+            'until': until,
+            'project': args.project,
+            'fts': args.fts,
+            'sem': args.sem,
+            'top': args.top,
+            'rescore_multiplier': args.rescore_multiplier,
+            'coarse': args.coarse,
+            'group': args.group,
+            'convos': args.convos,
+            'per_convo': args.per_convo,
+        }, sort_keys=True)
+        cached = None if args.no_sem_cache else _sem_cache_get(qv, cache_params)
 
         out = {
             'query': args.query,
@@ -330,17 +879,36 @@ def main():
             'since': args.since,
             'until': args.until,
             'project': args.project,
-            'counts': {'fts': len(fts), 'semantic': len(sem), 'merged': len(merged)},
-            'seconds': round(time.time() - t0, 3),
         }
-
+        if cached:
+            sim, result = cached
+            out.update(result)
+            out['cached'] = round(sim, 4)
+            out['seconds'] = round(time.time() - t0, 3)
+            ev.ok(extra={'seconds': out['seconds'], 'cached': out['cached'], **out['counts']})
+            print(_dumps_pretty(out).decode('utf-8'))
+            return  # the daemon workers still running are dropped at exit
+
+        if f_corpus is not None:
+            f_corpus.result()  # surface load errors; semantic_search then hits the _load_corpus cache
+        fts = f_fts.result()
+        sem = semantic_search(args.query, args.role, since, until, args.sem, rescore_multiplier=args.rescore_multiplier, qv=qv, coarse=args.coarse)
+        hits = _merge_hits(fts, sem, args.project)
+
+        result = {'counts': {'fts': len(fts), 'semantic': len(sem), 'merged': len(hits)}}
         if args.group:
-            out['grouped'] = _group_by_conversation(merged[: max(args.top, args.convos * args.per_convo)], args.convos, args.per_convo)
+            result['grouped'] = _group_by_conversation(_rank_hits(hits.values(), max(args.top, args.convos * args.per_convo)), args.convos, args.per_convo)
         else:
-            out['hits'] = merged[: args.top]
+            result['hits'] = _rank_hits(hits.values(), args.top)
+        if not args.no_sem_cache:
+            _sem_cache_put(qv, cache_params, result)
+
+        out['counts'] = result.pop('counts')
+        out['seconds'] = round(time.time() - t0, 3)
+        out.update(result)
 
         ev.ok(extra={'seconds': out['seconds'], **out['counts']})
-        print(json.dumps(out, ensure_ascii=False, indent=2))
+        print(_dumps_pretty(out).decode('utf-8'))
 
 
 if __name__ == '__main__':
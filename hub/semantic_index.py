@@ -3,11 +3,27 @@
 MVP design:
 - Source: hub/chatgpt.sqlite (messages table)
 - Target: hub/semantic.sqlite
-  - docs(id TEXT PRIMARY KEY, source TEXT, text TEXT, meta_json TEXT)
+  - docs(id TEXT PRIMARY KEY, source TEXT, text TEXT, meta_json TEXT,
+         author_role TEXT, created_at REAL, text_len INTEGER)
+    (author_role/created_at/text_len copy meta_json/length(text) so search filters in SQL)
   - vecs(id TEXT PRIMARY KEY, dim INT, v BLOB)
+  - vecs_i8(id TEXT PRIMARY KEY, scale REAL, q BLOB)
+  - vecs_off(id TEXT PRIMARY KEY, off INT, dim INT)
+  - vecs_b(id TEXT PRIMARY KEY, b BLOB)
+  - meta(key TEXT PRIMARY KEY, value TEXT)
+- Target: hub/semantic.vecs, append-only float32 copy of vecs.v; vecs_off gives
+  each id's byte offset so search can np.memmap it instead of SELECTing blobs.
+  Rebuilt from vecs with --rebuild-vecs (indexes built before the file existed).
 
-Vector format: float32 little-endian bytes.
+Vector format: float32 little-endian bytes, L2-normalized at insert (cosine is
+then a plain dot); vecs_i8 holds the same vector quantized to int8
+(v ~= q * scale, scale = max|v| / 127) for the coarse scan, vecs_b the 1-bit
+sign code (v > mean(v), packed MSB first like np.packbits) for the optional
+Hamming prefilter (search.py --coarse bin). meta.unit_norm='1'
+says every row is normalized: set when the index starts empty, or by
+semantic_normalize.py for indexes built before.
 Resume: skips ids already present.
+Embedding: batches of --batch docs per /api/embed call, --workers requests in flight.
 
 Usage:
   python hub/semantic_index.py --limit 5000
@@ -16,10 +32,17 @@ Usage:
 
 import argparse
 import json
+import math
+import os
 import sqlite3
 import struct
 import time
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# shared with search, so docs.created_at always parses like its --since/--until filters
+from search import _as_ts
 
 BASE = 'http://127.0.0.1:11434'
 EMBED_MODEL = 'nomic-embed-text:latest'
@@ -36,8 +59,6 @@ def ollama_embed(text: str, retries: int = 5):
             v = out.get('embedding')
             if not v:
                 raise RuntimeError('empty embedding')
-            # small throttle helps stability
-            time.sleep(0.05)
             return v
         except Exception as e:
             last_err = e
@@ -46,14 +67,77 @@ def ollama_embed(text: str, retries: int = 5):
     raise last_err
 
 
+def ollama_embed_batch(texts: list[str], retries: int = 5):
+    """One /api/embed request for the whole batch; vectors come back in input order."""
+    last_err = None
+    for i in range(retries):
+        try:
+            payload = json.dumps({'model': EMBED_MODEL, 'input': texts}).encode('utf-8')
+            req = urllib.request.Request(BASE + '/api/embed', data=payload, headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(req, timeout=600) as r:
+                out = json.loads(r.read().decode('utf-8'))
+            vs = out.get('embeddings') or []
+            if len(vs) != len(texts) or not all(vs):
+                raise RuntimeError(f'got {len(vs)} embeddings for {len(texts)} inputs')
+            return vs
+        except Exception as e:
+            last_err = e
+            time.sleep(min(2 ** i, 10))
+
+    raise last_err
+
+
+def embed_batch(batch):
+    """batch: [(mid, snippet)] -> [(mid, vec or exception)].
+
+    If the batch request keeps failing, embed one by one so a single bad doc only skips itself.
+    """
+    try:
+        return list(zip((mid for mid, _ in batch), ollama_embed_batch([snip for _, snip in batch])))
+    except Exception:
+        pass
+    out = []
+    for mid, snip in batch:
+        try:
+            out.append((mid, ollama_embed(snip, retries=2)))
+        except Exception as e:
+            out.append((mid, e))
+    return out
+
+
 def pack_f32(vec):
     return struct.pack('<' + 'f' * len(vec), *map(float, vec))
 
 
+def normalize_l2(vec):
+    n = math.sqrt(sum(float(x) * float(x) for x in vec))
+    return [float(x) / n for x in vec] if n else [float(x) for x in vec]
+
+
+def quantize_i8(vec):
+    """Symmetric per-vector int8: returns (scale, int8 bytes) with v ~= q * scale."""
+    scale = max((abs(float(x)) for x in vec), default=0.0) / 127.0 or 1.0
+    q = [max(-127, min(127, round(float(x) / scale))) for x in vec]
+    return scale, struct.pack('<' + 'b' * len(q), *q)
+
+
+def binarize(vec):
+    """1 bit per dim (v > mean(v)), packed 8 dims per byte, first dim in the high bit."""
+    vec = [float(x) for x in vec]
+    mean = sum(vec) / len(vec) if vec else 0.0
+    out = bytearray((len(vec) + 7) // 8)
+    for i, x in enumerate(vec):
+        if x > mean:
+            out[i >> 3] |= 0x80 >> (i & 7)
+    return bytes(out)
+
+
 def ensure_target(db_path: str):
     con = sqlite3.connect(db_path)
     con.execute('PRAGMA journal_mode=WAL;')
     con.execute('PRAGMA synchronous=NORMAL;')
+    con.execute('PRAGMA temp_store=MEMORY;')
+    con.execute('PRAGMA cache_size=-65536;')
     con.executescript(
         """
         CREATE TABLE IF NOT EXISTS docs(
@@ -67,12 +151,73 @@ def ensure_target(db_path: str):
           dim INTEGER,
           v BLOB
         );
+        CREATE TABLE IF NOT EXISTS vecs_i8(
+          id TEXT PRIMARY KEY,
+          scale REAL,
+          q BLOB
+        );
+        CREATE TABLE IF NOT EXISTS vecs_off(
+          id TEXT PRIMARY KEY,
+          off INTEGER,
+          dim INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS vecs_b(
+          id TEXT PRIMARY KEY,
+          b BLOB
+        );
+        CREATE TABLE IF NOT EXISTS meta(
+          key TEXT PRIMARY KEY,
+          value TEXT
+        );
         CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source);
         """
     )
+    # filter columns (added after the first indexes were built: backfill from meta_json)
+    cols = {r[1] for r in con.execute('PRAGMA table_info(docs)')}
+    for col, typ in (('author_role', 'TEXT'), ('created_at', 'REAL'), ('text_len', 'INTEGER')):
+        if col not in cols:
+            con.execute(f'ALTER TABLE docs ADD COLUMN {col} {typ}')
+    if 'text_len' not in cols:
+        con.create_function('as_ts', 1, _as_ts, deterministic=True)
+        con.execute(
+            """
+            UPDATE docs SET
+              author_role = json_extract(meta_json, '$.author_role'),
+              created_at = as_ts(json_extract(meta_json, '$.created_at')),
+              text_len = length(text)
+            """
+        )
+    con.execute('CREATE INDEX IF NOT EXISTS idx_docs_role_ts ON docs(author_role, created_at)')
+    con.commit()
+
+    if con.execute('SELECT 1 FROM vecs LIMIT 1').fetchone() is None:
+        # empty index: everything written from now on is unit-norm
+        con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('unit_norm', '1')")
+        con.commit()
     return con
 
 
+def vecs_path(db_path) -> Path:
+    """semantic.sqlite -> semantic.vecs"""
+    return Path(db_path).with_suffix('.vecs')
+
+
+def rebuild_vecs_file(con, db_path) -> int:
+    """Rewrite <db>.vecs and vecs_off from the vecs table; returns the row count."""
+    path = vecs_path(db_path)
+    tmp = path.with_name(path.name + '.tmp')
+    offs = []
+    with open(tmp, 'wb') as f:
+        for mid, dim, blob in con.execute('SELECT id, dim, v FROM vecs ORDER BY rowid'):
+            offs.append((mid, f.tell(), dim))
+            f.write(blob)
+    con.execute('DELETE FROM vecs_off')
+    con.executemany('INSERT INTO vecs_off(id, off, dim) VALUES (?,?,?)', offs)
+    con.commit()
+    os.replace(tmp, path)
+    return len(offs)
+
+
 def main():
     from action_log import log_event
 
@@ -81,10 +226,16 @@ def main():
     ap.add_argument('--dst', default=r'D:\\PROJECTS\\matter-hub\\hub\\semantic.sqlite')
     ap.add_argument('--limit', type=int, default=2000)
     ap.add_argument('--where', default="content_text IS NOT NULL AND length(content_text) > 0")
+    ap.add_argument('--batch', type=int, default=32, help='docs per /api/embed request')
+    ap.add_argument('--workers', type=int, default=4, help='concurrent embed requests')
+    ap.add_argument('--commit-every', type=int, default=512, help='rows buffered per write transaction')
+    ap.add_argument('--rebuild-vecs', action='store_true', help='rewrite semantic.vecs from the vecs table first')
     args = ap.parse_args()
 
     src = sqlite3.connect(args.src)
     dst = ensure_target(args.dst)
+    if args.rebuild_vecs:
+        print(json.dumps({'vecs_file': str(vecs_path(args.dst)), 'rows': rebuild_vecs_file(dst, args.dst)}, ensure_ascii=False))
 
     # attach dst to src so we can filter out already-embedded ids in one query
     src.execute("ATTACH DATABASE ? AS dst", (args.dst,))
@@ -102,37 +253,65 @@ def main():
     rows = src.execute(q, (args.limit,)).fetchall()
     print(json.dumps({'candidates': len(rows)}, ensure_ascii=False))
 
-    with log_event('semantic_index', params={'limit': args.limit, 'where': args.where, 'src': args.src, 'dst': args.dst, 'candidates': len(rows)}) as ev:
+    with log_event('semantic_index', params={'limit': args.limit, 'where': args.where, 'src': args.src, 'dst': args.dst, 'candidates': len(rows), 'batch': args.batch, 'workers': args.workers}) as ev:
         n = 0
         t0 = time.time()
 
+        docs = {}
         for mid, cid, role, created_at, text in rows:
             snippet = (text or '').replace('\x00', ' ')
             if len(snippet) > 2000:
                 snippet = snippet[:2000]
+            docs[mid] = (snippet, {'conversation_id': cid, 'author_role': role, 'created_at': created_at})
+
+        items = [(mid, snip) for mid, (snip, _) in docs.items()]
+        step = max(1, args.batch)
+        batches = [items[i:i + step] for i in range(0, len(items), step)]
+
+        doc_rows, vec_rows, i8_rows, off_rows, b_rows = [], [], [], [], []
+
+        def flush():
+            # one transaction (and one executemany per table) per buffered chunk;
+            # the .vecs bytes are flushed before the offsets pointing at them commit
+            vf.flush()
+            with dst:
+                dst.executemany('INSERT OR REPLACE INTO docs(id, source, text, meta_json, author_role, created_at, text_len) VALUES (?,?,?,?,?,?,?)', doc_rows)
+                dst.executemany('INSERT OR REPLACE INTO vecs(id, dim, v) VALUES (?,?,?)', vec_rows)
+                dst.executemany('INSERT OR REPLACE INTO vecs_i8(id, scale, q) VALUES (?,?,?)', i8_rows)
+                dst.executemany('INSERT OR REPLACE INTO vecs_off(id, off, dim) VALUES (?,?,?)', off_rows)
+                dst.executemany('INSERT OR REPLACE INTO vecs_b(id, b) VALUES (?,?)', b_rows)
+            for buf in (doc_rows, vec_rows, i8_rows, off_rows, b_rows):
+                buf.clear()
+
+        # workers only talk to Ollama; this thread is the single sqlite writer
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex, open(vecs_path(args.dst), 'ab') as vf:
+            for results in ex.map(embed_batch, batches):
+                for mid, vec in results:
+                    if isinstance(vec, Exception):
+                        # skip problematic docs but keep going
+                        print(f"WARN embedding failed id={mid}: {type(vec).__name__}: {vec}")
+                        continue
+                    snippet, meta = docs[mid]
+                    vec = normalize_l2(vec)
+                    doc_rows.append((
+                        mid, 'chatgpt.messages', snippet, json.dumps(meta, ensure_ascii=False),
+                        meta['author_role'], _as_ts(meta['created_at']), len(snippet),
+                    ))
+                    blob = pack_f32(vec)
+                    vec_rows.append((mid, len(vec), blob))
+                    i8_rows.append((mid, *quantize_i8(vec)))
+                    b_rows.append((mid, binarize(vec)))
+                    off_rows.append((mid, vf.tell(), len(vec)))
+                    vf.write(blob)
+                    n += 1
+
+                if len(vec_rows) >= args.commit_every:
+                    flush()
+                    dt_s = time.time() - t0
+                    print(f"... embedded {n}/{len(rows)} in {dt_s:.1f}s ({n/dt_s:.2f} docs/s)")
+
+            flush()
 
-            try:
-                vec = ollama_embed(snippet)
-            except Exception as e:
-                # skip problematic docs but keep going
-                print(f"WARN embedding failed id={mid}: {type(e).__name__}: {e}")
-                continue
-
-            blob = pack_f32(vec)
-            meta = {'conversation_id': cid, 'author_role': role, 'created_at': created_at}
-            dst.execute(
-                'INSERT OR REPLACE INTO docs(id, source, text, meta_json) VALUES (?,?,?,?)',
-                (mid, 'chatgpt.messages', snippet, json.dumps(meta, ensure_ascii=False)),
-            )
-            dst.execute('INSERT OR REPLACE INTO vecs(id, dim, v) VALUES (?,?,?)', (mid, len(vec), blob))
-
-            n += 1
-            if n % 100 == 0:
-                dst.commit()
-                dt_s = time.time() - t0
-                print(f"... embedded {n}/{len(rows)} in {dt_s:.1f}s ({n/dt_s:.2f} docs/s)")
-
-        dst.commit()
         dt_s = time.time() - t0
         summary = {'embedded': n, 'seconds': round(dt_s, 2), 'docs_per_s': round(n/dt_s, 3) if dt_s else None, 'dst': args.dst}
         ev.ok(extra=summary)
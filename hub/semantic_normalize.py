@@ -0,0 +1,62 @@
+"""One-shot migration: L2-normalize the vectors of an existing semantic.sqlite.
+
+semantic_index.py now stores unit-norm vectors; indexes built before that
+hold raw Ollama outputs. This rewrites vecs.v (and vecs_i8 from it) in
+place, rebuilds semantic.vecs from them and sets meta.unit_norm='1', after
+which search scores by plain dot.
+Safe to re-run.
+
+Usage:
+  python hub/semantic_normalize.py
+  python hub/semantic_normalize.py --db hub/semantic.sqlite
+"""
+
+import argparse
+import json
+import struct
+import time
+
+from semantic_index import ensure_target, normalize_l2, pack_f32, quantize_i8, rebuild_vecs_file
+
+
+def main():
+    from action_log import log_event
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--db', default=r'D:\\PROJECTS\\matter-hub\\hub\\semantic.sqlite')
+    ap.add_argument('--batch', type=int, default=1000)
+    args = ap.parse_args()
+
+    con = ensure_target(args.db)
+
+    with log_event('semantic_normalize', params={'db': args.db}, message='Normalize semantic vectors', tags=['search']) as ev:
+        t0 = time.time()
+        n = 0
+        last = 0
+        while True:
+            rows = con.execute('SELECT rowid, id, v FROM vecs WHERE rowid > ? ORDER BY rowid LIMIT ?', (last, args.batch)).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+
+            vec_rows, i8_rows = [], []
+            for _, mid, blob in rows:
+                vec = normalize_l2(struct.unpack('<' + 'f' * (len(blob) // 4), blob))
+                vec_rows.append((pack_f32(vec), mid))
+                i8_rows.append((mid, *quantize_i8(vec)))
+            con.executemany('UPDATE vecs SET v=? WHERE id=?', vec_rows)
+            con.executemany('INSERT OR REPLACE INTO vecs_i8(id, scale, q) VALUES (?,?,?)', i8_rows)
+            con.commit()
+            n += len(rows)
+
+        rebuild_vecs_file(con, args.db)
+        con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('unit_norm', '1')")
+        con.commit()
+
+        summary = {'normalized': n, 'seconds': round(time.time() - t0, 2), 'db': args.db}
+        ev.ok(extra=summary)
+        print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,4 @@
 import json
-import re
 from pathlib import Path
 
 from pathlib import Path as _Path
@@ -7,28 +6,42 @@ import sys as _sys
 _sys.path.append(str(_Path(__file__).resolve().parents[1] / 'hub'))
 from action_log import log_event
 
+try:
+    import orjson
+
+    def _dumps_pretty(o) -> bytes:
+        return orjson.dumps(o, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+except ImportError:  # stdlib fallback, same output modulo whitespace
+    def _dumps_pretty(o) -> bytes:
+        return json.dumps(o, ensure_ascii=False, indent=2).encode('utf-8')
+
+    _loads = json.loads
+
 RAW = Path(__file__).resolve().parent / 'projects-scan.raw.json'
 OUT = Path(__file__).resolve().parent / 'projects.json'
 
-BAD_PATTERNS = [
-    r"\\AppData\\",
-    r"\\Program Files",
-    r"\\ProgramData\\",
-    r"\\Windows\\",
-    r"\\npm-cache\\",
-    r"\\Temp\\",
-    r"\\games\\UE_",
-]
-rx = re.compile("|".join(BAD_PATTERNS), re.I)
+# literal path fragments, matched case-insensitively on the lowered path
+BAD_PATTERNS = (
+    '\\appdata\\',
+    '\\program files',
+    '\\programdata\\',
+    '\\windows\\',
+    '\\npm-cache\\',
+    '\\temp\\',
+    '\\games\\ue_',
+)
 
 
 def keep(path: str) -> bool:
-    return rx.search(path) is None
+    low = path.lower()
+    return not any(b in low for b in BAD_PATTERNS)
 
 
 def main():
     with log_event('build_registry', params={'raw': str(RAW), 'out': str(OUT)}, message='Build project registry', tags=['registry']) as ev:
-        data = json.loads(RAW.read_text(encoding='utf-8'))
+        data = _loads(RAW.read_bytes())
         projects = [p for p in data['projects'] if keep(p['path'])]
 
         # score & basic normalization
@@ -46,7 +59,7 @@ def main():
             'projects': projects,
         }
 
-        OUT.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding='utf-8')
+        OUT.write_bytes(_dumps_pretty(out))
         ev.ok(extra={'count': len(projects), 'out': str(OUT)})
         print(json.dumps({'count': len(projects), 'out': str(OUT)}, ensure_ascii=False))
 